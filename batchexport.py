@@ -0,0 +1,175 @@
+"""
+Batch figure export through a pool of pre-warmed worker processes.
+
+    def build(n):
+        figure = Figure(figsize=(6, 4))
+        ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+        ...
+        return figure
+
+    jobs = [(functools.partial(build, n), 'report-{}.png'.format(n)) for n in range(1000)]
+    for result in render_many(jobs, max_in_flight=16):
+        if result.error:
+            print(result.path, result.error)
+
+Before its first job each worker imports matplotlib (forcing Agg) and
+fastaxes, and draws a small fastticks figure, so the font cache is loaded; an
+error doing so is reported as the error of that job.  A worker then reuses the
+Agg renderer of its previous job when the figure size and the dpi it is saved
+at match, and hands its tick PropsRegistry on to the next figure (see
+fastaxes.use_props_registry).
+
+The figure building callables are sent to the workers, so they must be
+picklable (module level functions or functools.partial of them).  A job whose
+worker process dies (a crash in a C extension, os._exit) is reported as
+failed, and the pool replaces the worker.
+"""
+import gc
+import os
+import time
+import traceback
+import collections
+import multiprocessing
+
+ExportResult = collections.namedtuple('ExportResult', 'path seconds error')
+
+# per worker process state
+_registry = None
+_renderers = {}
+_warmed = False
+# shared with the parent:  the pid of the worker running the job of each slot
+_pids = None
+
+def _init_worker(pids):
+    global _pids
+    _pids = pids
+
+def _warm_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import fastaxes
+
+    figure = Figure(figsize=(1, 1))
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.set_xlabel('x')
+    FigureCanvasAgg(figure).draw()
+
+def _savefig_dpi(figure, savefig_kwargs):
+    'The dpi figure.savefig(**savefig_kwargs) renders at'
+    from matplotlib import rcParams
+    dpi = savefig_kwargs.get('dpi', rcParams['savefig.dpi'])
+    if dpi is None or dpi == 'figure':
+        dpi = figure.dpi
+    return dpi
+
+def _export(job, slot=None):
+    global _registry, _warmed
+    if slot is not None:
+        _pids[slot] = os.getpid()
+    build, path, savefig_kwargs = job
+
+    start = time.time()
+    try:
+        if not _warmed:
+            # not a pool initializer, whose errors make the pool start new
+            # workers forever
+            _warmed = True
+            _warm_worker()
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import fastaxes
+
+        figure = build()
+        canvas = FigureCanvasAgg(figure)
+        if _registry is not None:
+            fastaxes.use_props_registry(figure, _registry)
+
+        # savefig draws at its own dpi, which get_renderer keys the renderer
+        # on (with the size in pixels, rounded on some versions), so keep the
+        # key it used along with the renderer
+        key = (tuple(figure.get_size_inches()), _savefig_dpi(figure, savefig_kwargs))
+        if key in _renderers:
+            # the renderer is cleared at the start of every draw
+            canvas.renderer, canvas._lastKey = _renderers[key]
+        figure.savefig(path, **savefig_kwargs)
+
+        renderer = getattr(canvas, 'renderer', None)
+        if renderer is not None:
+            _renderers.clear()
+            _renderers[key] = (renderer, canvas._lastKey)
+        _registry = fastaxes.props_registry(figure)
+        del figure, canvas
+        gc.collect()
+    except Exception:
+        return ExportResult(path, time.time() - start, traceback.format_exc())
+    return ExportResult(path, time.time() - start, None)
+
+def _worker_died(pending, pids, grace):
+    '''
+    Remove the first job of pending whose worker process has exited without
+    finishing it and return its ExportResult, or None.
+    '''
+    alive = set(p.pid for p in multiprocessing.active_children())
+    for i, (path, submitted, result, slot) in enumerate(pending):
+        pid = pids[slot]
+        if pid == 0 or pid in alive or result.ready():
+            continue
+        # the result of a worker which exited after its last task may still
+        # be on its way
+        result.wait(grace)
+        if not result.ready():
+            del pending[i]
+            return ExportResult(path, time.time() - submitted,
+                                'worker process %d died running the job' % pid)
+
+def _next_done(pending, pids=None, poll=0.01, grace=1.0):
+    '''
+    Remove the first finished job from pending, a list of (path, submitted,
+    AsyncResult, slot), and return its ExportResult
+    '''
+    while True:
+        for i, (path, submitted, result, slot) in enumerate(pending):
+            if result.ready():
+                del pending[i]
+                try:
+                    return result.get()
+                except Exception:
+                    return ExportResult(path, time.time() - submitted, traceback.format_exc())
+        # python 2 has no error_callback for apply_async
+        pending[0][2].wait(poll)
+        if pids is not None:
+            died = _worker_died(pending, pids, grace)
+            if died is not None:
+                return died
+
+def render_many(jobs, processes=None, max_in_flight=None, savefig_kwargs=None, maxtasksperchild=None):
+    '''
+    Save the figures of jobs, an iterable of (build, path), keeping at most
+    max_in_flight of them submitted, and yield an ExportResult(path, seconds,
+    error) for each as it completes
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if max_in_flight is None:
+        max_in_flight = 2 * processes
+    savefig_kwargs = savefig_kwargs or {}
+
+    # every job in flight has a slot, where its worker puts its pid
+    pids = multiprocessing.Array('l', max_in_flight, lock=False)
+    pending = []
+    pool = multiprocessing.Pool(processes, _init_worker, (pids,), maxtasksperchild)
+    try:
+        for build, path in jobs:
+            if len(pending) >= max_in_flight:
+                yield _next_done(pending, pids)
+            slot = min(set(range(max_in_flight)) - set(entry[3] for entry in pending))
+            pids[slot] = 0
+            result = pool.apply_async(_export, ((build, path, savefig_kwargs), slot))
+            pending.append((path, time.time(), result, slot))
+        while pending:
+            yield _next_done(pending, pids)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -1,7 +1,15 @@
+import collections
+import functools
+import math
+import re
+import timeit
+import weakref
 import numpy
 import matplotlib
 from matplotlib import rcParams
 import matplotlib.cbook as cbook
+import matplotlib.colors as mcolors
+import matplotlib.dates as mdates
 import matplotlib.font_manager as font_manager
 import matplotlib.artist as martist
 import matplotlib.axes as maxes
@@ -9,31 +17,494 @@ import matplotlib.axis as maxis
 import matplotlib.lines as mlines
 import matplotlib.path as mpath
 import matplotlib.patches as mpatches
+import matplotlib.rcsetup as mrcsetup
+import matplotlib.spines as mspines
 import matplotlib.text as mtext
 import matplotlib.ticker as mticker
 import matplotlib.transforms as mtransforms
+from matplotlib.backend_bases import RendererBase
+from matplotlib.backends.backend_agg import RendererAgg, get_hinting_flag
+try:
+    from matplotlib.layout_engine import TightLayoutEngine
+except ImportError:
+    # before matplotlib 3.6 Figure.draw calls tight_layout
+    TightLayoutEngine = None
+import fastdates
+import strokebatch
+import pdfmarkers
 
 GRIDLINE_INTERPOLATION_STEPS = 180
 
+def font_key(prop):
+    '''
+    The fields of a FontProperties as a hashable key.  FontProperties compare
+    equal when their hashes do, so they cannot be keys themselves.
+    '''
+    return (tuple(prop.get_family()), prop.get_style(), prop.get_variant(),
+            prop.get_weight(), prop.get_stretch(), prop.get_size_in_points(),
+            prop.get_file(), getattr(prop, 'get_math_fontfamily', lambda: None)())
+
+class LRUCache(object):
+    '''
+    Base of the bounded least recently used caches, with cumulative hits and
+    misses counters (see stats()).
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def _lookup(self, key):
+        'The entry of key, made the most recently used, or None'
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry
+        return entry
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class ExtentCache(LRUCache):
+    'LRU cache of tick label extents relative to the label anchor'
+    def __init__(self, maxsize=2048):
+        LRUCache.__init__(self, maxsize)
+
+    def _key(self, t, renderer):
+        return (t.get_text(),
+                font_key(t.get_fontproperties()),
+                t.get_verticalalignment(),
+                t.get_horizontalalignment(),
+                t.get_rotation(),
+                t.figure.dpi,
+                type(renderer))
+
+    def get_window_extent(self, t, renderer):
+        key = self._key(t, renderer)
+        ax, ay = t.get_transform().transform_point(t.get_position())
+        box = self._lookup(key)
+        if box is None:
+            self.misses += 1
+            bbox = t.get_window_extent(renderer)
+            self._store(key, bbox.translated(-ax, -ay))
+            return bbox
+        self.hits += 1
+        return box.translated(ax, ay)
+
+# shared by the text pools of every Props
+label_extent_cache = ExtentCache()
+
+class GlyphMetrics(object):
+    'Widths of plain tick label strings from the glyph metrics of one font'
+    alphabet = u'0123456789.,:%+-e\u2212'
+
+    def __init__(self, fontprops):
+        self.fontprops = fontprops.copy()
+        codes = [ord(c) for c in self.alphabet]
+        self._index = numpy.empty(max(codes) + 1, dtype=int)
+        self._index.fill(-1)
+        self._index[codes] = numpy.arange(len(codes))
+        self.ink = numpy.zeros(len(codes))
+        self.advance = numpy.zeros(len(codes))
+        self.bearing = numpy.zeros(len(codes))
+        # 0 not measured yet, 1 usable, -1 unusable
+        self._glyphs = numpy.zeros(len(codes), dtype=numpy.int8)
+        self._pairs = numpy.zeros((len(codes), len(codes)), dtype=numpy.int8)
+        self._lp = None
+
+    def _measure(self, renderer, s):
+        return renderer.get_text_width_height_descent(s, self.fontprops, ismath=False)
+
+    def _measure_glyph(self, renderer, i):
+        if self._lp is None:
+            self._lp = self._measure(renderer, 'lp')
+            # bearings are relative to the first glyph of the alphabet
+            if i != 0:
+                self._measure_glyph(renderer, 0)
+        _, lp_h, lp_d = self._lp
+        c = self.alphabet[i]
+        w, h, d = self._measure(renderer, c)
+        if self._glyphs[0] < 0 or h - d > lp_h - lp_d or d > lp_d:
+            self._glyphs[i] = -1
+            return
+        self.ink[i] = w
+        self.advance[i] = self._measure(renderer, c + c)[0] - w
+        ref = self.alphabet[0]
+        self.bearing[i] = self._measure(renderer, ref + c)[0] - self.advance[0] - w
+        self._glyphs[i] = 1
+
+    def widths(self, renderer, labels):
+        '''
+        Ink widths of the non-empty strings labels, or None if any of them
+        needs the full text layout.
+        '''
+        codes = numpy.frombuffer(u''.join(labels).encode('utf-32-le'), dtype='<u4')
+        if codes.max() >= len(self._index):
+            return None
+        glyphs = self._index[codes]
+        if (glyphs < 0).any():
+            return None
+        for i in numpy.unique(glyphs[self._glyphs[glyphs] == 0]):
+            self._measure_glyph(renderer, i)
+        if (self._glyphs[glyphs] < 0).any():
+            return None
+
+        lengths = numpy.array([len(l) for l in labels])
+        starts = numpy.cumsum(lengths) - lengths
+        ends = starts + lengths - 1
+        first, last = glyphs[starts], glyphs[ends]
+
+        # adjacent pairs within a label
+        inner = numpy.ones(len(glyphs), dtype=bool)
+        inner[ends] = False
+        pairs = numpy.column_stack((glyphs[inner], glyphs[1:][inner[:-1]]))
+        for a, b in pairs[self._pairs[pairs[:, 0], pairs[:, 1]] == 0]:
+            expected = self._measure(renderer, self.alphabet[a] + self.alphabet[b])[0]
+            width = self.advance[a] + self.ink[b] + self.bearing[b] - self.bearing[a]
+            self._pairs[a, b] = 1 if width == expected else -1
+        if (self._pairs[pairs[:, 0], pairs[:, 1]] < 0).any():
+            return None
+
+        advance = numpy.add.reduceat(self.advance[glyphs], starts) - self.advance[last]
+        return advance + self.ink[last] + self.bearing[last] - self.bearing[first]
+
+_glyph_metrics = {}
+
+def glyph_metrics(renderer, fontprops, dpi):
+    'Get the GlyphMetrics of a font for a type of renderer at dpi'
+    key = (font_key(fontprops), dpi, type(renderer))
+    metrics = _glyph_metrics.get(key)
+    if metrics is None:
+        metrics = GlyphMetrics(fontprops)
+        _glyph_metrics[key] = metrics
+    return metrics
+
+# RendererAgg.draw_text rasterizes the whole string at the origin and copies
+# the bitmap to a rounded pixel position, which LabelBitmapCache relies on.
+# Later versions of matplotlib render glyph by glyph at subpixel positions.
+_whole_string_text = not hasattr(RendererAgg, '_draw_text_glyphs_and_boxes')
+
+class LabelBitmapCache(LRUCache):
+    'LRU cache of the Agg bitmaps of tick label strings'
+    def __init__(self, maxsize=1024):
+        LRUCache.__init__(self, maxsize)
+
+    def draw_text(self, renderer, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        'RendererAgg.draw_text drawing from the cache'
+        antialiased = rcParams['text.antialiased']
+        if (ismath or not _whole_string_text or bool(gc.get_antialiased()) != bool(antialiased)
+                or (len(s) == 1 and ord(s) > 127)):
+            # mathtext, or a single character which draw_text loads by itself
+            return RendererAgg.draw_text(renderer, gc, x, y, s, prop, angle, ismath, mtext)
+
+        key = (s, font_key(prop), renderer.dpi, angle, rcParams['text.hinting'], antialiased)
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            prepare_font = getattr(renderer, '_prepare_font', None) or renderer._get_agg_font
+            font = prepare_font(prop)
+            font.set_text(s, 0, flags=get_hinting_flag())
+            font.draw_glyphs_to_bitmap(antialiased=antialiased)
+            xo, yo = font.get_bitmap_offset()
+            entry = (numpy.array(font.get_image()), xo / 64.0, yo / 64.0, font.get_descent() / 64.0)
+            self._store(key, entry)
+        else:
+            self.hits += 1
+
+        image, xo, yo, d = entry
+        xd = -d * math.sin(math.radians(angle))
+        yd = d * math.cos(math.radians(angle))
+        # the builtin round as in draw_text:  on python 2 it rounds halves
+        # away from zero where numpy.round rounds them to even
+        renderer._renderer.draw_text_image(image, round(x - xd + xo), round(y + yd + yo) + 1, angle, gc)
+
+label_bitmap_cache = LabelBitmapCache()
+
+class _BlitLabels(object):
+    '''
+    Context in which the draw_text of an Agg renderer draws from
+    label_bitmap_cache.  Does nothing for a renderer of None.
+    '''
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def __enter__(self):
+        if self.renderer is not None:
+            self.renderer.draw_text = functools.partial(label_bitmap_cache.draw_text, self.renderer)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.renderer is not None:
+            del self.renderer.draw_text
+
+def _format_null(formatter, values, indices):
+    return [''] * len(values)
+
+def _format_fixed(formatter, values, indices):
+    seq = formatter.seq
+    return [seq[i] if i < len(seq) else '' for i in indices.tolist()]
+
+def _fix_minus(formatter, labels):
+    minus = formatter.fix_minus('-')
+    if minus != '-':
+        labels = [l.replace('-', minus) for l in labels]
+    return labels
+
+def _format_scalar(formatter, values, indices):
+    # ScalarFormatter.__call__ and pprint_val over the whole array
+    if len(formatter.locs) == 0:
+        return [''] * len(values)
+    if formatter._useLocale:
+        return None
+    xp = (values - formatter.offset) / (10. ** formatter.orderOfMagnitude)
+    xp[numpy.absolute(xp) < 1e-8] = 0
+    labels = numpy.char.mod(formatter.format, xp).tolist()
+    return _fix_minus(formatter, labels)
+
+# (major, minor) of the installed matplotlib
+_mpl_version = tuple(int(v) for v in re.match(r'(\d+)\.(\d+)', matplotlib.__version__).groups())
+
+# Batch implementations of formatters, keyed by exact type so that
+# subclasses overriding __call__ take the per-value path.  The scalar one
+# reproduces ScalarFormatter.pprint_val, which formats up to 3.0, so later
+# versions format per value.
+_batch_formatters = {
+    mticker.NullFormatter: _format_null,
+    mticker.FixedFormatter: _format_fixed,
+}
+if _mpl_version < (3, 1):
+    _batch_formatters[mticker.ScalarFormatter] = _format_scalar
+
+class DateLabelCache(LRUCache):
+    'LRU cache of date tick labels keyed by (format, date number)'
+    def __init__(self, maxsize=4096):
+        LRUCache.__init__(self, maxsize)
+
+    def get_labels(self, fmt, values):
+        '''
+        Get the labels of the date numbers values in the UTC format fmt, or
+        None if they cannot be formatted in batch.
+        '''
+        labels = []
+        missing = []
+        values = values.tolist()
+        for i, v in enumerate(values):
+            l = self._lookup((fmt, v))
+            if l is None:
+                missing.append(i)
+            labels.append(l)
+        self.hits += len(values) - len(missing)
+        if missing:
+            dt = fastdates.num2datetime64([values[i] for i in missing])
+            new = None if dt is None else fastdates.strftime64(fmt, dt)
+            if new is None:
+                return None
+            self.misses += len(missing)
+            for i, l in zip(missing, new):
+                labels[i] = l
+                self._store((fmt, values[i]), l)
+        return labels
+
+date_label_cache = DateLabelCache()
+
+def _format_dates(formatter, values, indices):
+    if not fastdates.is_utc(formatter.tz) or getattr(formatter, '_usetex', False):
+        return None
+    return date_label_cache.get_labels(formatter.fmt, values)
+
+def _format_auto_dates(formatter, values, indices):
+    # the format AutoDateFormatter.__call__ picks
+    try:
+        scale = float(formatter._locator._get_unit())
+    except AttributeError:
+        return None
+    fmt = formatter.defaultfmt
+    for possible_scale in sorted(formatter.scaled):
+        if possible_scale >= scale:
+            fmt = formatter.scaled[possible_scale]
+            break
+    if not isinstance(fmt, str) or not fastdates.is_utc(formatter._tz) or getattr(formatter, '_usetex', False):
+        return None
+    return date_label_cache.get_labels(fmt, values)
+
+# formatters whose label for a value does not depend on its position among
+# the ticks once set_locs has fixed their settings.  LogFormatter and
+# LogFormatterExponent are left out:  their __call__ reads the view interval.
+_position_free_formatters = set([
+    mticker.ScalarFormatter, mticker.FormatStrFormatter,
+    mticker.LogFormatterMathtext, mdates.DateFormatter])
+
+_batch_formatters[mdates.DateFormatter] = _format_dates
+_batch_formatters[mdates.AutoDateFormatter] = _format_auto_dates
+
+def format_ticks(formatter, values, indices):
+    'Format values at indices with formatter, in one pass where supported'
+    batch = _batch_formatters.get(type(formatter))
+    labels = None if batch is None else batch(formatter, values, indices)
+    if labels is None:
+        labels = [formatter(val, i) for val, i in zip(values, indices.tolist())]
+    return labels
+
+class LabelCache(LRUCache):
+    'LRU cache of tick label strings by formatter, view and locations'
+    def __init__(self, maxsize=256):
+        LRUCache.__init__(self, maxsize)
+
+    @staticmethod
+    def _settings(formatter):
+        settings = []
+        for k, v in sorted(vars(formatter).items()):
+            if k == 'locs':
+                continue
+            if isinstance(v, (list, tuple)):
+                v = tuple(v)
+            elif isinstance(v, numpy.ndarray):
+                v = tuple(v.ravel().tolist())
+            elif isinstance(v, (set, frozenset)):
+                v = frozenset(v)
+            try:
+                hash(v)
+            except TypeError:
+                continue
+            if isinstance(v, (tuple, frozenset, str, int, float, bool, type(None))):
+                settings.append((k, v))
+        return tuple(settings)
+
+    def forget(self, formatter):
+        'Drop the labels made by formatter'
+        for key in [key for key in self._entries if key[1] == id(formatter)]:
+            del self._entries[key]
+
+    def get_labels(self, formatter, locations, view_interval, keep=None):
+        '''
+        Get the label strings for locations.  When keep is given only the
+        locations where it is True are formatted, the rest are labelled ''.
+        '''
+        key = (type(formatter), id(formatter),
+               self._settings(formatter),
+               tuple(view_interval),
+               locations.tobytes(),
+               None if keep is None else keep.tobytes())
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            formatter.set_locs(locations)
+            if keep is None:
+                labels = format_ticks(formatter, locations, numpy.arange(len(locations)))
+            else:
+                indices = numpy.nonzero(keep)[0]
+                labels = [''] * len(locations)
+                for i, l in zip(indices, format_ticks(formatter, locations[indices], indices)):
+                    labels[i] = l
+            entry = (labels, locations.copy())
+            # set_locs has updated the settings (offset, format and so on) to
+            # what the next lookup for these locations will find
+            self._store(key[:2] + (self._settings(formatter),) + key[3:], entry)
+        else:
+            self.hits += 1
+            locs = getattr(formatter, 'locs', None)
+            if locs is None or not numpy.array_equal(locs, entry[1]):
+                # keep offset and order of magnitude state consistent for
+                # the offset text
+                formatter.set_locs(entry[1])
+        return entry[0]
+
+label_string_cache = LabelCache()
+
+def is_blank(a):
+    'True if drawing the artist paints nothing'
+    if not a.get_visible():
+        return True
+    return isinstance(a, mtext.Text) and a.get_text() == ''
+
 class Props(object):
     def __init__(self):
+        # pooled tick label Text objects of label1 and label2
         self.texts = []
+        self.texts2 = []
+        self._extent_cache = label_extent_cache
 
-    def _construct_tick_label(self, index, vert, horiz):
+    def _construct_tick_label(self, index, vert, horiz, side=1, position=(0, 0)):
         if not hasattr(self, '_font_props'):
             self._font_props = font_manager.FontProperties(size=self._labelsize)
-        if len(self.texts) <= index:
+        texts = self.texts if side == 1 else self.texts2
+        if len(texts) <= index:
             t = mtext.Text(
-                    x=0, y=0,
+                    x=position[0], y=position[1],
                     fontproperties=self._font_props,
                     color=self._labelcolor,
                     verticalalignment=vert,
                     horizontalalignment=horiz)
-            self.texts.append(t)
+            texts.append(t)
         else:
-            t = self.texts[index]
+            t = texts[index]
         return t
 
+def tick_style_keys(name, major):
+    'The rcParams that tick_props reads for a tick group'
+    which = 'major' if major else 'minor'
+    return ('axes.grid', 'axes.grid.which',
+            '%s.%s.size' % (name, which),
+            '%s.%s.width' % (name, which),
+            '%s.direction' % name,
+            '%s.color' % name,
+            '%s.%s.pad' % (name, which),
+            '%s.labelsize' % name,
+            'grid.color', 'grid.linestyle', 'grid.linewidth', 'grid.alpha')
+
+class PropsRegistry(object):
+    'Tick Props, fonts and Text pools shared by the fast axes of a figure'
+    def __init__(self):
+        self._props = {}
+        self._fonts = {}
+
+    def font(self, size):
+        fp = self._fonts.get(size)
+        if fp is None:
+            fp = font_manager.FontProperties(size=size)
+            self._fonts[size] = fp
+        return fp
+
+    def get_props(self, axis, major):
+        name = '%stick' % axis.axis_name
+        key = (type(axis), major) + tuple(rcParams[k] for k in tick_style_keys(name, major))
+        props = self._props.get(key)
+        if props is None:
+            props = axis.tick_props(major)
+            props._font_props = self.font(props._labelsize)
+            self._props[key] = props
+        return props
+
+_registries = weakref.WeakKeyDictionary()
+
+def props_registry(figure):
+    'Get the PropsRegistry of a figure'
+    registry = _registries.get(figure)
+    if registry is None:
+        registry = PropsRegistry()
+        _registries[figure] = registry
+    return registry
+
+def use_props_registry(figure, registry):
+    '''
+    Make figure use registry, typically that of an earlier figure, before its
+    first draw.  The earlier figure must not be drawn again.
+    '''
+    for props in registry._props.values():
+        del props.texts[:]
+        del props.texts2[:]
+    _registries[figure] = registry
+
 def tick_props(name, axes, major):
     props = Props()
 
@@ -44,6 +515,12 @@ def tick_props(name, axes, major):
     else :
         grid_on = False
     props._grid_on = grid_on
+    props._major = major
+
+    props._grid_color = rcParams['grid.color']
+    props._grid_linestyle = rcParams['grid.linestyle']
+    props._grid_linewidth = rcParams['grid.linewidth']
+    props._grid_alpha = rcParams['grid.alpha']
 
     if major:
         size = rcParams['%s.major.size' % name]
@@ -81,10 +558,447 @@ def tick_props(name, axes, major):
     props._zorder = zorder
     return props
 
+class AxisStats(object):
+    'Timers (seconds) and counters of the phases of fast axis drawing'
+    # locator and formatter are only charged when the tick groups are
+    # rebuilt; tightbbox is the whole of get_tightbbox
+    TIMERS = ('locator', 'formatter', 'layout', 'ticks', 'grid', 'labels', 'tightbbox')
+    COUNTERS = ('draws', 'tightbbox', 'ticks', 'labels')
+
+    def __init__(self):
+        self.times = dict.fromkeys(self.TIMERS, 0.)
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def add(self, other):
+        for k, v in other.times.items():
+            self.times[k] += v
+        for k, v in other.counts.items():
+            self.counts[k] += v
+
+    def as_dict(self):
+        return {'times': dict(self.times), 'counts': dict(self.counts)}
+
+class _PhaseTimer(object):
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stats.times[self.name] += timeit.default_timer() - self.start
+
+class _NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+_null_timer = _NullTimer()
+
+class _Instrumented(object):
+    '''
+    Context in which a fast axis charges its timers and counters to the
+    AxisStats of the current frame, looked up once on the outermost entry.
+    '''
+    def __init__(self, axis):
+        self.axis = axis
+
+    def __enter__(self):
+        axis = self.axis
+        self.previous = axis._stats
+        if self.previous is None:
+            stats = _figure_stats.get(axis.figure)
+            if stats is not None:
+                axis._stats = stats._entry(axis)[0]
+        return axis._stats
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.axis._stats = self.previous
+
+class FigureStats(object):
+    'Last frame and running AxisStats of the fast axes of a figure'
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._axes = weakref.WeakKeyDictionary()
+
+    def _entry(self, axis):
+        entry = self._axes.get(axis)
+        if entry is None:
+            # pending frame, last frame, total
+            entry = [AxisStats(), AxisStats(), AxisStats()]
+            self._axes[axis] = entry
+        return entry
+
+    def _finish_draw(self, axis):
+        entry = self._entry(axis)
+        frame = entry[0]
+        entry[2].add(frame)
+        entry[0:2] = AxisStats(), frame
+        if self.callback is not None:
+            self.callback(axis, frame)
+
+    def _aggregate(self, index, axis):
+        if axis is not None:
+            return self._entry(axis)[index]
+        stats = AxisStats()
+        for entry in list(self._axes.values()):
+            stats.add(entry[index])
+        return stats
+
+    def last(self, axis=None):
+        'AxisStats of the last frame of axis, or summed over every axis'
+        return self._aggregate(1, axis)
+
+    def total(self, axis=None):
+        'Running AxisStats of axis, or summed over every axis'
+        return self._aggregate(2, axis)
+
+    def reset(self):
+        self._axes.clear()
+
+_figure_stats = weakref.WeakKeyDictionary()
+
+# figure -> {(axis type, major ticker id, minor ticker id): (state, tick values)}
+# shared by the axes of a figure which share their tickers
+_shared_ticks = weakref.WeakKeyDictionary()
+
+def enable_stats(figure, callback=None):
+    'Turn on draw instrumentation for figure and return its FigureStats'
+    stats = FigureStats(callback)
+    _figure_stats[figure] = stats
+    return stats
+
+def disable_stats(figure):
+    _figure_stats.pop(figure, None)
+
+def figure_stats(figure):
+    'The FigureStats of figure, or None when instrumentation is off'
+    return _figure_stats.get(figure)
+
+def _text_signature(t):
+    if is_blank(t):
+        return None
+    return (t.get_text(), font_key(t.get_fontproperties()), t.get_rotation())
+
+def _text_style(t):
+    'What a Text draws with, besides its string and position'
+    return (t.get_visible(), font_key(t.get_fontproperties()),
+            mcolors.colorConverter.to_rgba(t.get_color()), t.get_alpha(), t.get_rotation(),
+            t.get_horizontalalignment(), t.get_verticalalignment())
+
+def _axis_label_state(axis):
+    # the position of a label placed by the axis follows from the ticks
+    position = None if axis._autolabelpos else (axis.label.get_position(), axis.label.get_transform())
+    return (axis.label.get_text(), _text_style(axis.label), axis.labelpad, position,
+            _text_style(axis.offsetText))
+
+def _spine_state(spine):
+    'What a spine draws with'
+    return (spine.get_visible(), spine.get_zorder(), spine.get_alpha(),
+            tuple(spine.get_edgecolor()), tuple(spine.get_facecolor()), spine.get_fill(),
+            spine.get_linewidth(), spine.get_linestyle(), spine.get_capstyle(),
+            spine.get_joinstyle(), spine.get_hatch(), spine._position, spine._bounds)
+
+_subplot_params = ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')
+
+def _fixed_aspect(ax):
+    return ax.get_aspect() != 'auto' or getattr(ax, 'get_box_aspect', lambda: None)() is not None
+
+class TightLayoutCache(object):
+    'tight_layout reusing the subplot parameters of unchanged decorations'
+    def __init__(self, figure):
+        self.figure = figure
+        self.hits = 0
+        self.misses = 0
+        # a layout in progress, which may call tight_layout or the layout
+        # engine again
+        self._laying_out = False
+        self.invalidate()
+        functools.update_wrapper(self, figure.tight_layout)
+
+    def invalidate(self):
+        'Lay out again on the next call, after a change the signatures leave out'
+        self._signature = None
+        self._params = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _current_signature(self, args, kwargs):
+        figure = self.figure
+        signatures = []
+        for ax in figure.axes:
+            signature = getattr(ax, 'decoration_signature', None)
+            if signature is None:
+                return None
+            signatures.append((id(ax), signature()))
+        params = None
+        # the boxes of fixed aspect axes depend on the subplot parameters, so
+        # these figures take a few layouts to settle
+        if any(_fixed_aspect(ax) for ax in figure.axes):
+            pars = figure.subplotpars
+            params = tuple(round(getattr(pars, k), 6) for k in _subplot_params)
+        # renderers count by type
+        args = [type(a) if isinstance(a, RendererBase) else a for a in args]
+        kwargs = sorted((k, type(v) if isinstance(v, RendererBase) else v) for k, v in kwargs.items())
+        return (tuple(figure.get_size_inches()), figure.dpi,
+                repr((args, kwargs)), tuple(signatures), params)
+
+    def _layout(self, lay_out, args, kwargs):
+        'Call lay_out() unless the last layout had the same signature'
+        if self._laying_out:
+            return lay_out()
+        figure = self.figure
+        signature = self._current_signature(args, kwargs)
+        if signature is not None and signature == self._signature:
+            self.hits += 1
+            pars = figure.subplotpars
+            if self._params != dict((k, getattr(pars, k)) for k in self._params):
+                figure.subplots_adjust(**self._params)
+            return
+        self.misses += 1
+        self._laying_out = True
+        try:
+            lay_out()
+        finally:
+            self._laying_out = False
+        self._signature = signature
+        pars = figure.subplotpars
+        self._params = dict((k, getattr(pars, k)) for k in _subplot_params)
+
+    def __call__(self, *args, **kwargs):
+        figure = self.figure
+        self._layout(functools.partial(type(figure).tight_layout, figure, *args, **kwargs), args, kwargs)
+
+    def _execute(self, engine, figure):
+        'TightLayoutEngine.execute, which Figure.draw calls from matplotlib 3.6'
+        self._layout(functools.partial(type(engine).execute, engine, figure), (), engine.get())
+
+def _get_layout_engine(cache):
+    'Figure.get_layout_engine, hooking the execute method of a TightLayoutEngine'
+    figure = cache.figure
+    engine = type(figure).get_layout_engine(figure)
+    if isinstance(engine, TightLayoutEngine) and 'execute' not in vars(engine):
+        engine.execute = functools.partial(cache._execute, engine)
+    return engine
+
+def cache_tight_layout(figure):
+    'Make figure.tight_layout a TightLayoutCache and return it'
+    cache = figure.__dict__.get('tight_layout')
+    if not isinstance(cache, TightLayoutCache):
+        cache = TightLayoutCache(figure)
+        figure.tight_layout = cache
+        if TightLayoutEngine is not None:
+            figure.get_layout_engine = functools.partial(_get_layout_engine, cache)
+    return cache
+
+class _DefaultProjection(object):
+    '''
+    Context in which the axes figure.add_axes and figure.add_subplot make
+    without a projection, polar or axes_class argument have projection.
+    '''
+    def __init__(self, figure, projection):
+        self.figure = figure
+        self.projection = projection
+
+    def _defaulting(self, name):
+        method = getattr(type(self.figure), name)
+        def add(*args, **kwargs):
+            if not (args and isinstance(args[0], maxes.Axes)) and not (
+                    'projection' in kwargs or 'polar' in kwargs or 'axes_class' in kwargs):
+                kwargs['projection'] = self.projection
+            return method(self.figure, *args, **kwargs)
+        return add
+
+    def __enter__(self):
+        figure = self.figure
+        self._saved = dict((name, vars(figure)[name]) for name in ('add_axes', 'add_subplot')
+                           if name in vars(figure))
+        figure.add_axes = self._defaulting('add_axes')
+        figure.add_subplot = self._defaulting('add_subplot')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        del self.figure.add_axes, self.figure.add_subplot
+        vars(self.figure).update(self._saved)
+
+class FastColorbars(object):
+    'Figure.colorbar which gives the colorbar of a FastAxes its projection'
+    def __init__(self, figure):
+        self.figure = figure
+
+    def _parent(self, mappable, ax):
+        'The axes Figure.colorbar takes the space of the colorbar from'
+        if ax is None:
+            ax = getattr(mappable, 'axes', None)
+        if ax is None and self.figure.axes:
+            ax = self.figure.gca()
+        if isinstance(ax, (list, tuple, numpy.ndarray)):
+            ax = numpy.ravel(numpy.asarray(ax, dtype=object))
+            ax = ax[0] if len(ax) else None
+        return ax
+
+    def __call__(self, mappable, cax=None, ax=None, **kwargs):
+        figure = self.figure
+        parent = self._parent(mappable, ax) if cax is None else None
+        if not isinstance(parent, FastAxes):
+            return type(figure).colorbar(figure, mappable, cax, ax, **kwargs)
+        # make_axes and make_axes_gridspec add the colorbar axes through
+        # add_axes and add_subplot
+        with _DefaultProjection(figure, parent.name):
+            return type(figure).colorbar(figure, mappable, cax, ax, **kwargs)
+
+def fast_colorbars(figure):
+    '''
+    Make figure.colorbar, which pyplot.colorbar calls too, a FastColorbars and
+    return it.
+    '''
+    colorbars = figure.__dict__.get('colorbar')
+    if not isinstance(colorbars, FastColorbars):
+        colorbars = FastColorbars(figure)
+        figure.colorbar = colorbars
+    return colorbars
+
+class _Batched(object):
+    '''
+    Context in which a spine or axis of a FastAxes draws into its StrokeBatch
+    '''
+    def __init__(self, artist, install=True):
+        self.artist = artist
+        self.install = install
+
+    def __enter__(self):
+        batches = getattr(self.artist.axes, '_stroke_batches', None)
+        self.entry = batches.get(self.artist) if batches else None
+        if self.entry is not None:
+            if self.install:
+                self.entry[0].install()
+            return self.entry[0]
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.entry is not None:
+            batch, remaining = self.entry
+            batch.uninstall()
+            remaining.discard(self.artist)
+            if not remaining:
+                batch.flush()
+
+class _StrokeBatching(object):
+    'Context in which the decoration groups of a FastAxes draw into StrokeBatches'
+    def __init__(self, axes, renderer, groups):
+        self.axes = axes
+        self.renderer = renderer
+        self.groups = groups
+
+    def __enter__(self):
+        batches = {}
+        self.batches = []
+        for group in self.groups:
+            batch = strokebatch.StrokeBatch(self.renderer)
+            remaining = set(group)
+            for a in group:
+                batches[a] = (batch, remaining)
+            self.batches.append(batch)
+        self.axes._stroke_batches = batches
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.axes._stroke_batches = None
+        # groups with artists which did not draw after all
+        for batch in self.batches:
+            batch.flush()
+
+class FastSpine(mspines.Spine):
+    'A Spine which draws into the StrokeBatch of its FastAxes when there is one'
+    # not wrapped in allow_rasterization:  Spine.draw is, and spine_style
+    # leaves rasterized spines and those with an agg filter to it
+    def draw(self, renderer, *args, **kwargs):
+        with _Batched(self, install=False) as batch:
+            if batch is not None and batch.renderer is renderer:
+                style = strokebatch.spine_style(self) if self.get_visible() else None
+                if style is not None:
+                    batch.add_spine(self, style)
+                    self.stale = False
+                    return
+                batch.install()
+            return super(FastSpine, self).draw(renderer, *args, **kwargs)
+
 class FastAxisMixin(object):
+    # draw all gridlines of a tick group as one NaN-separated Line2D rather
+    # than one PathPatch per location (see _get_gridline)
+    batch_gridlines = True
+
+    # minimum spacing in points, see set_tick_thinning
+    _min_tick_spacing = None
+    _min_label_spacing = None
+
+    # see set_streaming
+    _streaming = False
+
+    # let the tick groups of all the axes in a PDF file share one marker
+    # XObject per tick style (see pdfmarkers)
+    share_pdf_markers = True
+
+    # draw tick labels on Agg from label_bitmap_cache (see LabelBitmapCache)
+    cache_label_bitmaps = True
+
+    # the AxisStats of the current frame while instrumented (see _Instrumented)
+    _stats = None
+
     def reset_ticks(self):
         self._lastNumMajorTicks = 0
         self._lastNumMinorTicks = 0
+        self.invalidate_ticks()
+        # Axis.reset_ticks builds a first Tick, whose transforms come from
+        # Spine.get_spine_transform, which sets the default position of a
+        # spine not positioned yet (and so resets the ticks once more).
+        # There is no Tick here, so position the spines of this axis now
+        # rather than on the first draw, where it would wipe the tick state
+        # being built and leave the spines drawn before the axis
+        # untransformed.
+        for spine in getattr(self.axes, 'spines', {}).values():
+            if spine.axis is self:
+                spine._ensure_position_is_set()
+        # Spine.set_position resets the ticks for them to pick up its new
+        # transform; the tick groups keep their lines, so update those
+        transfactory = self.axes.get_xaxis_transform if self.axis_name == 'x' else self.axes.get_yaxis_transform
+        for name, which in [('_minor_tick1', 'tick1'), ('_minor_tick2', 'tick2'),
+                            ('_major_tick1', 'tick1'), ('_major_tick2', 'tick2')]:
+            tickline = self.__dict__.get(name)
+            if tickline is not None:
+                tickline.set_transform(transfactory(which=which))
+
+    def _timed(self, name):
+        if self._stats is None:
+            return _null_timer
+        return _PhaseTimer(self._stats, name)
+
+    def invalidate_ticks(self):
+        '''
+        Rebuild the ticks, labels and label layout on the next draw, for
+        tickers depending on state outside their attributes
+        '''
+        self._tick_state = None
+        self._streamed_labels = {}
+        self._streamed_layout = {}
+        if self.figure is not None and hasattr(self, 'major'):
+            label_string_cache.forget(self.major.formatter)
+            label_string_cache.forget(self.minor.formatter)
+            shared = _shared_ticks.get(self.figure)
+            if shared:
+                shared.pop((type(self), id(self.major), id(self.minor)), None)
+
+    def set_streaming(self, b):
+        '''
+        Carry the labels and extents of the ticks still on screen over to
+        the next frame when the view slides
+        '''
+        self._streaming = b
+        self.invalidate_ticks()
+
+    def get_streaming(self):
+        return self._streaming
 
     def set_clip_path(self, clippath, transform=None):
         pass
@@ -100,20 +1014,313 @@ class FastAxisMixin(object):
         tickline.set_axes(self.axes)
         return tickline
 
-    def iter_tick_groups(self):
+    def _construct_grid_group(self, props):
+        gridline = mlines.Line2D(xdata=(), ydata=(),
+                   color=props._grid_color,
+                   linestyle=props._grid_linestyle,
+                   linewidth=props._grid_linewidth,
+                   alpha=props._grid_alpha,
+                   zorder=props._zorder,
+                   # the caps of the PathPatch of _get_gridline
+                   solid_capstyle='butt')
         transfactory = self.axes.get_xaxis_transform if self.axis_name == 'x' else self.axes.get_yaxis_transform
+        gridline.set_transform(transfactory(which='grid'))
+        gridline.set_axes(self.axes)
+        gridline.set_figure(self.figure)
+        return gridline
+
+    def _grid_on(self, props):
+        if props._major:
+            return getattr(self, '_gridOnMajor', props._grid_on)
+        else:
+            return getattr(self, '_gridOnMinor', props._grid_on)
+
+    def _get_grid_group(self, props, locations):
+        '''
+        Get the NaN separated Line2D drawing every gridline of a tick group
+        '''
+        if not hasattr(self, '_grid_groups'):
+            self._grid_groups = {}
+        group = self._grid_groups.get(props._major)
+        if group is None:
+            group = [self._construct_grid_group(props), None, None]
+            self._grid_groups[props._major] = group
+        gridline, along, across = group
+
+        if along is None or len(along) != 3 * len(locations):
+            along = numpy.empty(3 * len(locations))
+            along[2::3] = numpy.nan
+            across = numpy.empty_like(along)
+            across[0::3] = 0.
+            across[1::3] = 1.
+            across[2::3] = numpy.nan
+            group[1:] = along, across
+        along[0::3] = locations
+        along[1::3] = locations
+
+        if self.axis_name == 'x':
+            gridline.set_data(along, across)
+        else:
+            gridline.set_data(across, along)
+        return gridline
+
+    def _tick_labels(self, label_formatter, locations, major):
+        if label_formatter == None:
+            return None
+        keep = self._thinning_mask(locations, self._min_label_spacing)
+        with self._timed('formatter'):
+            if self._streaming and keep is None:
+                return self._stream_tick_labels(label_formatter, locations, major)
+            return label_string_cache.get_labels(label_formatter, locations, self.get_view_interval(), keep)
+
+    def _stream_tick_labels(self, formatter, locations, major):
+        '''
+        Get the label strings for locations, reusing those of the previous
+        frame for the locations which are still there.
+        '''
+        formatter.set_locs(locations)
+        settings = (type(formatter), id(formatter), LabelCache._settings(formatter))
+        previous = self._streamed_labels.get(major)
+        labels = None
+        if previous is not None and previous[0] == settings and type(formatter) in _position_free_formatters:
+            old = previous[1]
+            labels = [old.get(val) for val in locations.tolist()]
+            entering = numpy.array([i for i, l in enumerate(labels) if l is None], dtype=int)
+            if len(entering) > 0:
+                for i, l in zip(entering, format_ticks(formatter, locations[entering], entering)):
+                    labels[i] = l
+        if labels is None:
+            labels = format_ticks(formatter, locations, numpy.arange(len(locations)))
+        self._streamed_labels[major] = (settings, dict(zip(locations.tolist(), labels)))
+        return labels
+
+    def set_tick_thinning(self, tick_spacing=None, label_spacing=None):
+        '''
+        Drop minor ticks closer than tick_spacing points and blank labels
+        closer than label_spacing points; None disables either
+        '''
+        self._min_tick_spacing = tick_spacing
+        self._min_label_spacing = label_spacing
+        self.invalidate_ticks()
+
+    def _thinning_mask(self, locations, spacing):
+        'Boolean mask of the locations to keep for a minimum spacing in points, or None'
+        if spacing is None or len(locations) < 2:
+            return None
+        xy = numpy.zeros((len(locations), 2))
+        i = 0 if self.axis_name == 'x' else 1
+        xy[:, i] = locations
+        transfactory = self.axes.get_xaxis_transform if self.axis_name == 'x' else self.axes.get_yaxis_transform
+        pixels = transfactory(which='tick1').transform(xy)[:, i]
+        gap = numpy.abs(numpy.diff(pixels)).min()
+        spacing = spacing * self.figure.dpi / 72.
+        if gap >= spacing:
+            return None
+        stride = int(numpy.ceil(spacing / gap)) if gap > 0 else len(locations)
+        return numpy.arange(len(locations)) % stride == 0
+
+    def _ticker_state(self):
+        'What the tick locations and labels depend on'
+        locators = self.get_minor_locator(), self.get_major_locator()
+        formatters = self.minor.formatter, self.major.formatter
+        return (tuple(self.get_view_interval()),
+                self.get_scale(),
+                locators, formatters,
+                tuple(LabelCache._settings(ticker) for ticker in locators + formatters))
+
+    def _current_tick_state(self):
+        # The axes bbox covers both the figure size and the axes position.
+        # It is rounded because tight_layout jitters it in the last bits
+        # from one draw to the next.
+        return (self._ticker_state(),
+                tuple(numpy.round(self.axes.bbox.bounds, 6)),
+                self.figure.dpi,
+                self._tick_sides(True),
+                self._tick_sides(False))
+
+    def _tick_sides(self, major):
+        '''
+        The (tick1On, tick2On, label1On, label2On) switches of a tick group, as
+        set by set_tick_params, tick_left(), tick_top() and the like.
+        '''
+        kw = self._major_tick_kw if major else self._minor_tick_kw
+        return (kw.get('tick1On', True), kw.get('tick2On', True),
+                kw.get('label1On', True), kw.get('label2On', False))
+
+    def _label_sides(self, props):
+        tick1, tick2, label1, label2 = self._tick_sides(props._major)
+        return [side for side, on in ((1, label1), (2, label2)) if on]
+
+    def _label_anchors(self, props, locations, side):
+        'Display coordinates of the anchors of tick labels at locations'
+        trans = self._text_transform(props, side)[0]
+        xy = numpy.zeros((len(locations), 2))
+        i = 0 if self.axis_name == 'x' else 1
+        xy[:, i] = locations
+        # label2 sits at 1 in axes coordinates
+        xy[:, 1 - i] = side - 1
+        return trans.transform(xy)
+
+    def iter_tick_groups(self):
+        '''
+        Iterate over (locations, tick lines, props, labels) of the minor and
+        major tick groups
+        '''
+        if getattr(self, '_tick_state', None) != self._current_tick_state():
+            self._tick_groups = list(self._generate_tick_groups())
+            self._label_layout = {}
+            # after set_locs has updated the settings of the formatters
+            self._tick_state = self._current_tick_state()
+        return iter(self._tick_groups)
+
+    def _place_tick_label(self, i, val, l, props, side=1):
+        t = self._construct_tick_label(i, props, side)
+        f = t.set_y if self.axis_name == 'y' else t.set_x
+        f(val)
+        t.set_text(l)
+        return t
+
+    def _get_label_layout(self, renderer, locations, props, labels, side=1):
+        '''
+        Get a list of (index, location, label, window extent) for the visible
+        labels of a group on one side
+        '''
+        key = (props._major, type(renderer), side)
+        layout = self._label_layout.get(key)
+        if layout is None:
+            layout = []
+            if labels != None:
+                with self._timed('layout'):
+                    if self._streaming:
+                        layout = self._stream_label_layout(key, renderer, locations, props, labels, side)
+                    else:
+                        for i, (val, l) in enumerate(zip(locations, labels)):
+                            if l == '':
+                                continue
+                            t = self._place_tick_label(i, val, l, props, side)
+                            layout.append((i, val, l, props._extent_cache.get_window_extent(t, renderer)))
+            self._label_layout[key] = layout
+        return layout
+
+    def _stream_label_layout(self, key, renderer, locations, props, labels, side):
+        '''
+        Lay out the labels of a group, moving the extents of those of the
+        previous frame which are still there
+        '''
+        anchors = self._label_anchors(props, locations, side).tolist()
+
+        previous = self._streamed_layout.get(key)
+        if previous is None or previous[0] != (id(props), self.figure.dpi):
+            previous = (None, {})
+        old = previous[1]
+
+        layout = []
+        current = {}
+        for i, (val, l) in enumerate(zip(locations.tolist(), labels)):
+            if l == '':
+                continue
+            x, y = anchors[i]
+            entry = old.get(val)
+            if entry is not None and entry[0] == l:
+                extent = entry[3].translated(x - entry[1], y - entry[2])
+            else:
+                t = self._place_tick_label(i, val, l, props, side)
+                extent = props._extent_cache.get_window_extent(t, renderer)
+            layout.append((i, val, l, extent))
+            current[val] = (l, x, y, extent)
+        self._streamed_layout[key] = ((id(props), self.figure.dpi), current)
+        return layout
+
+    def _label_boxes(self, renderer, locations, props, labels, side=1):
+        '''
+        The (n, 4) extents of the visible labels of a group from glyph
+        metrics, or None if any label needs the text layout
+        '''
+        visible = [i for i, l in enumerate(labels) if l != '']
+        if len(visible) == 0:
+            return numpy.empty((0, 4))
+        strings = [labels[i] for i in visible]
+        if rcParams['text.usetex'] or any('$' in l for l in strings):
+            return None
+        widths = glyph_metrics(renderer, props._font_props, self.figure.dpi).widths(renderer, strings)
+        if widths is None:
+            return None
+
+        horiz = self._text_transform(props, side)[2]
+        anchors = self._label_anchors(props, locations[visible], side)
+
+        t = self._place_tick_label(visible[0], locations[visible[0]], strings[0], props, side)
+        if t.get_rotation() != 0:
+            return None
+        x0, y0, x1, y1 = props._extent_cache.get_window_extent(t, renderer).extents - numpy.tile(anchors[0], 2)
+        if x1 - x0 != widths[0]:
+            return None
+
+        boxes = numpy.empty((len(visible), 4))
+        if horiz == 'left':
+            boxes[:, 0] = anchors[:, 0] + x0
+            boxes[:, 2] = boxes[:, 0] + widths
+        elif horiz == 'right':
+            boxes[:, 2] = anchors[:, 0] + x1
+            boxes[:, 0] = boxes[:, 2] - widths
+        else:
+            center = anchors[:, 0] + (x0 + x1) / 2.
+            boxes[:, 0] = center - widths / 2.
+            boxes[:, 2] = center + widths / 2.
+        boxes[:, 1] = anchors[:, 1] + y0
+        boxes[:, 3] = anchors[:, 1] + y1
+        return boxes
+
+    def _tick_values(self):
+        '''
+        ((minor locations, labels), (major locations, labels)), computed
+        once for all the axes sharing the tickers of this one
+        '''
+        shared = None
+        if self._min_tick_spacing is None and self._min_label_spacing is None and not self._streaming:
+            key = (type(self), id(self.major), id(self.minor))
+            state = self._ticker_state()
+            shared = _shared_ticks.setdefault(self.figure, {})
+            entry = shared.get(key)
+            if entry is not None and entry[0] == state:
+                return entry[1]
+
         view_low, view_high = tuple(sorted(self.get_view_interval()))
-        #print view_low, view_high
+        # keep ticks on limits which carry rounding errors, such as those of
+        # colorbars, as Axis._update_ticks does
+        slack = (view_high - view_low) * 1e-10
+        view_low, view_high = view_low - slack, view_high + slack
+
+        with self._timed('locator'):
+            minor = numpy.array(fastdates.locate_ticks(self.get_minor_locator()))
+        minor = minor[(minor>=view_low) & (minor<=view_high)]
+        keep = self._thinning_mask(minor, self._min_tick_spacing)
+        if keep is not None:
+            minor = minor[keep]
+        minor_labels = self._tick_labels(self.minor.formatter, minor, False) if len(minor) > 0 else None
+
+        with self._timed('locator'):
+            major = numpy.array(fastdates.locate_ticks(self.get_major_locator()))
+        major = major[(major>=view_low) & (major<=view_high)]
+        major_labels = self._tick_labels(self.major.formatter, major, True) if len(major) > 0 else None
+
+        values = ((minor, minor_labels), (major, major_labels))
+        if shared is not None:
+            # after set_locs has updated the settings of the formatters
+            shared[key] = (self._ticker_state(), values)
+        return values
+
+    def _generate_tick_groups(self):
+        transfactory = self.axes.get_xaxis_transform if self.axis_name == 'x' else self.axes.get_yaxis_transform
+        (locations, labels), (major_locations, major_labels) = self._tick_values()
 
         # minor tick marks
-        locations = numpy.array(self.get_minor_locator()())
-        locations = locations[(locations>=view_low) & (locations<=view_high)]
         if len(locations) > 0:
             ones = numpy.empty_like(locations)
             ones.fill(1.)
             zeros = numpy.zeros_like(locations)
             if not hasattr(self, '_minor_tick_props'):
-                self._minor_tick_props = self.tick_props(major=False)
+                self._minor_tick_props = props_registry(self.figure).get_props(self, major=False)
 
                 tickline = self._construct_tick_group(self._minor_tick_props)
                 tickline.set_transform(transfactory(which='tick1'))
@@ -137,18 +1344,17 @@ class FastAxisMixin(object):
             self._minor_tick2.set_xdata(xdata)
             self._minor_tick2.set_ydata(ydata)
 
-            yield locations, [self._minor_tick1, self._minor_tick2], self._minor_tick_props, self.minor.formatter
+            yield locations, [self._minor_tick1, self._minor_tick2], self._minor_tick_props, labels
 
         # major tick marks
-        locations = numpy.array(self.get_major_locator()())
-        locations = locations[(locations>=view_low) & (locations<=view_high)]
+        locations, labels = major_locations, major_labels
         if len(locations) > 0:
             ones = numpy.empty_like(locations)
             ones.fill(1.)
             zeros = numpy.zeros_like(locations)
 
             if not hasattr(self, '_major_tick_props'):
-                self._major_tick_props = self.tick_props(major=True)
+                self._major_tick_props = props_registry(self.figure).get_props(self, major=True)
                 tickline = self._construct_tick_group(self._major_tick_props)
                 tickline.set_transform(transfactory(which='tick1'))
                 self._major_tick1 = tickline
@@ -171,7 +1377,7 @@ class FastAxisMixin(object):
             self._major_tick2.set_xdata(xdata)
             self._major_tick2.set_ydata(ydata)
 
-            yield locations, [self._major_tick1, self._major_tick2], self._major_tick_props, self.major.formatter
+            yield locations, [self._major_tick1, self._major_tick2], self._major_tick_props, labels
 
     def get_tightbbox(self, renderer):
         """
@@ -181,28 +1387,46 @@ class FastAxisMixin(object):
         if not self.get_visible():
             return
 
+        with _Instrumented(self) as stats:
+            if stats is not None:
+                stats.counts['tightbbox'] += 1
+            with self._timed('tightbbox'):
+                return self._get_tightbbox(renderer)
+
+    def _get_tightbbox(self, renderer):
         bb = []
+        bb1, bb2 = [], []
 
-        for locations, tickbars, props, label_formatter in self.iter_tick_groups():
-            if label_formatter != None:
-                label_formatter.set_locs(locations)
-                for i, val in enumerate(locations):
-                    l = label_formatter(val, i)
-                    if l == '':
-                        continue
-                    t = self._construct_tick_label(i, props)
-                    f = t.set_y if self.axis_name == 'y' else t.set_x
-                    f(val)
-                    t.set_text(l)
-                    bb.append(t.get_window_extent(renderer))
+        for locations, tickbars, props, labels in self.iter_tick_groups():
+            for side in self._label_sides(props):
+                side_bb = bb1 if side == 1 else bb2
+                # Only the union of the label boxes matters here.  When the
+                # label layout is not already known (it usually is not
+                # before tight_layout moves the axes) the boxes come from
+                # glyph metrics, and the layout is left to draw.
+                boxes = None
+                if labels != None and (props._major, type(renderer), side) not in self._label_layout:
+                    with self._timed('layout'):
+                        boxes = self._label_boxes(renderer, locations, props, labels, side)
+                if boxes is None:
+                    for i, val, l, extent in self._get_label_layout(renderer, locations, props, labels, side):
+                        side_bb.append(extent)
+                elif len(boxes) > 0:
+                    side_bb.append(mtransforms.Bbox.from_extents(
+                            boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()))
+        bb.extend(bb1)
+        bb.extend(bb2)
 
-        self._update_label_position(bb, [])
+        if not is_blank(self.label):
+            self._update_label_position(bb1, bb2)
 
-        self._update_offset_text_position(bb, [])
-        self.offsetText.set_text(self.major.formatter.get_offset())
+        offset = self.major.formatter.get_offset()
+        if offset:
+            self._update_offset_text_position(bb1, bb2)
+        self.offsetText.set_text(offset)
 
         for a in [self.label, self.offsetText]:
-            if a.get_visible():
+            if not is_blank(a):
                 bb.append(a.get_window_extent(renderer))
 
         #bb.extend(ticklabelBoxes)
@@ -216,48 +1440,84 @@ class FastAxisMixin(object):
         else:
             return None
 
+    def decoration_signature(self):
+        'A hashable summary of the labels and fonts get_tightbbox measures'
+        if not self.get_visible():
+            return None
+        with _Instrumented(self):
+            groups = tuple((props._major, font_key(props._font_props), tuple(labels) if labels != None else None)
+                           for locations, tickbars, props, labels in self.iter_tick_groups())
+        return (groups, self._tick_sides(True), self._tick_sides(False),
+                _text_signature(self.label), self.major.formatter.get_offset())
+
     @martist.allow_rasterization
     def draw(self, renderer, *args, **kwargs):
         'Draw the axis lines, grid lines, tick lines and labels'
+        with _Batched(self), _Instrumented(self):
+            self._draw(renderer)
 
+    def _draw(self, renderer):
         if not self.get_visible():
             return
         renderer.open_group(__name__)
 
-        bb = []
+        # the PDF renderer, also behind a MixedModeRenderer (which only
+        # forwards its attributes from matplotlib 2.2)
+        pdf_file = getattr(getattr(renderer, '_vector_renderer', renderer), 'file', None)
+        if self.share_pdf_markers and hasattr(pdf_file, 'markerObject') and hasattr(pdf_file, 'markers'):
+            pdfmarkers.index_pdf_markers(pdf_file)
+
+        bb1, bb2 = [], []
+        stats = self._stats
+        blit = _BlitLabels(renderer if self.cache_label_bitmaps and _whole_string_text
+                                      and isinstance(renderer, RendererAgg) else None)
+
+        for locations, tickbars, props, labels in self.iter_tick_groups():
+            if self._grid_on(props):
+                with self._timed('grid'):
+                    if self.batch_gridlines:
+                        self._get_grid_group(props, locations).draw(renderer)
+                    else:
+                        for i, val in enumerate(locations):
+                            t = self._get_gridline(val)
+                            t.draw(renderer)
+            tick1, tick2 = self._tick_sides(props._major)[:2]
+            with self._timed('ticks'):
+                for t, on in zip(tickbars, (tick1, tick2)):
+                    if on:
+                        t.draw(renderer)
+            for side in self._label_sides(props):
+                layout = self._get_label_layout(renderer, locations, props, labels, side)
+                with self._timed('labels'), blit:
+                    for i, val, l, extent in layout:
+                        self._place_tick_label(i, val, l, props, side).draw(renderer)
+                        (bb1 if side == 1 else bb2).append(extent)
+                if stats is not None:
+                    stats.counts['labels'] += len(layout)
+            if stats is not None:
+                stats.counts['ticks'] += len(locations)
 
-        for locations, tickbars, props, label_formatter in self.iter_tick_groups():
-            for t in tickbars:
-                t.draw(renderer)
-            if props._grid_on:
-                for i, val in enumerate(locations):
-                    t = self._get_gridline(val)
-                    #f = t.set_ydata if self.axis_name == 'y' else t.set_xdata
-                    #f(numpy.array(val, val))
-                    t.draw(renderer)
-            if label_formatter != None:
-                label_formatter.set_locs(locations)
-                for i, val in enumerate(locations):
-                    l = label_formatter(val, i)
-                    if l == '':
-                        continue
-                    t = self._construct_tick_label(i, props)
-                    f = t.set_y if self.axis_name == 'y' else t.set_x
-                    f(val)
-                    t.set_text(l)
-                    t.draw(renderer)
-                    bb.append(t.get_window_extent(renderer))
-
-        self._update_label_position(bb, [])
-        self.label.draw(renderer)
+        if not is_blank(self.label):
+            self._update_label_position(bb1, bb2)
+            self.label.draw(renderer)
 
         renderer.close_group(__name__)
 
+        if stats is not None:
+            stats.counts['draws'] += 1
+            _figure_stats[self.figure]._finish_draw(self)
+
 class FastXAxis(FastAxisMixin, maxis.XAxis):
-    def _construct_tick_label(self, index, props):
-        trans, vert, horiz = self.axes.get_xaxis_text1_transform(props._pad)
-        t = props._construct_tick_label(index, vert, horiz)
-        t.set_axes(self.axes)
+    def _text_transform(self, props, side=1):
+        if side == 1:
+            return self.axes.get_xaxis_text1_transform(props._pad)
+        return self.axes.get_xaxis_text2_transform(props._pad)
+
+    def _construct_tick_label(self, index, props, side=1):
+        trans, vert, horiz = self._text_transform(props, side)
+        # pooled Text objects are shared between the axes of a figure, so
+        # they are not bound to self.axes
+        t = props._construct_tick_label(index, vert, horiz, side, (0, 0) if side == 1 else (0, 1))
         t.set_figure(self.figure)
         t.set_transform(trans)
         return t
@@ -274,7 +1534,6 @@ class FastXAxis(FastAxisMixin, maxis.XAxis):
                    linewidth=rcParams['grid.linewidth'],
                    alpha=rcParams['grid.alpha']
                    )
-        #print list(l.get_path().iter_segments())
         l.set_transform(self.axes.get_xaxis_transform(which='grid'))
         #l.get_path()._interpolation_steps = GRIDLINE_INTERPOLATION_STEPS
         l.set_axes(self.axes)
@@ -296,10 +1555,16 @@ class FastXAxis(FastAxisMixin, maxis.XAxis):
         return props
 
 class FastYAxis(FastAxisMixin, maxis.YAxis):
-    def _construct_tick_label(self, index, props):
-        trans, vert, horiz = self.axes.get_yaxis_text1_transform(props._pad)
-        t = props._construct_tick_label(index, vert, horiz)
-        t.set_axes(self.axes)
+    def _text_transform(self, props, side=1):
+        if side == 1:
+            return self.axes.get_yaxis_text1_transform(props._pad)
+        return self.axes.get_yaxis_text2_transform(props._pad)
+
+    def _construct_tick_label(self, index, props, side=1):
+        trans, vert, horiz = self._text_transform(props, side)
+        # pooled Text objects are shared between the axes of a figure, so
+        # they are not bound to self.axes
+        t = props._construct_tick_label(index, vert, horiz, side, (0, 0) if side == 1 else (1, 0))
         t.set_figure(self.figure)
         t.set_transform(trans)
         return t
@@ -335,18 +1600,221 @@ class FastYAxis(FastAxisMixin, maxis.YAxis):
             props._pad = props._base_pad + props._size
         return props
 
+# axisbelow='line' (matplotlib 2.0)
+_axisbelow_line = hasattr(mrcsetup, 'validate_axisbelow')
+
+class DecorationImage(martist.Artist):
+    'The cached bitmap of the decorations of a FastAxes at one zorder'
+    def __init__(self, zorder, artists, image):
+        martist.Artist.__init__(self)
+        self.zorder = zorder
+        self.artists = artists
+        self.image = image
+
+    def draw(self, renderer, *args, **kwargs):
+        if self.image is None:
+            return
+        x, y, image = self.image
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(None)
+        renderer.draw_image(gc, x, y, image)
+        gc.restore()
+
 class FastAxes(maxes.Axes):
     name = 'fastticks'
 
+    # see set_cache_decorations
+    _cache_decorations = False
+    _decoration_cache = None
+
+    # see set_combine_decorations
+    _combine_decorations = False
+    _stroke_batches = None
+
+    # replace the tight_layout of the figure with a TightLayoutCache
+    incremental_tight_layout = True
+
+    # replace the colorbar of the figure with FastColorbars
+    fast_colorbars = True
+
+    def __init__(self, fig, *args, **kwargs):
+        super(FastAxes, self).__init__(fig, *args, **kwargs)
+        if self.incremental_tight_layout:
+            cache_tight_layout(fig)
+        if self.fast_colorbars:
+            fast_colorbars(fig)
+
+    def _make_twin_axes(self, *args, **kwargs):
+        'twinx and twiny make fastticks axes too'
+        if 'projection' not in kwargs and 'axes_class' not in kwargs:
+            kwargs['projection'] = self.name
+        return super(FastAxes, self)._make_twin_axes(*args, **kwargs)
+
+    def inset_axes(self, *args, **kwargs):
+        'inset_axes makes fastticks axes too (matplotlib versions which have it)'
+        if 'projection' not in kwargs and 'polar' not in kwargs and 'axes_class' not in kwargs:
+            kwargs['projection'] = self.name
+        return super(FastAxes, self).inset_axes(*args, **kwargs)
+
+    def decoration_signature(self):
+        'A hashable summary of the decorations get_tightbbox measures'
+        if not self.get_visible():
+            return None
+        titles = [getattr(self, name, None) for name in ('title', '_left_title', '_right_title')]
+        return (self.axison,
+                self.xaxis.decoration_signature() if self.axison else None,
+                self.yaxis.decoration_signature() if self.axison else None,
+                tuple(_text_signature(t) for t in titles if t is not None))
+
+    def set_cache_decorations(self, b):
+        '''
+        Composite the ticks, labels, gridlines and spines from cached Agg
+        bitmaps, one per zorder, while the view, size and dpi are unchanged
+        '''
+        self._cache_decorations = b
+        self.invalidate_decorations()
+
+    def get_cache_decorations(self):
+        return self._cache_decorations
+
+    def set_combine_decorations(self, b):
+        '''
+        Draw the spines, tick marks and gridlines of one style as one path on
+        Agg (see StrokeBatch)
+        '''
+        self._combine_decorations = b
+
+    def get_combine_decorations(self):
+        return self._combine_decorations
+
+    def _decoration_groups(self, artists):
+        'A list of (zorder, artists) of the spines and axes among artists'
+        # Axes.draw sets the zorder of the axes from axisbelow up to
+        # matplotlib 2.0, and set_axisbelow does after that.  Matplotlib 1.x
+        # has no 'line' and draws the axes below for any true value.
+        axisbelow = self.get_axisbelow()
+        if not _axisbelow_line and axisbelow is not False:
+            axisbelow = bool(axisbelow)
+        axis_zorder = {True: 0.5, 'line': 1.5, False: 2.5}.get(axisbelow)
+        groups = collections.OrderedDict()
+        for a in artists:
+            if isinstance(a, FastAxisMixin):
+                zorder = axis_zorder if axis_zorder is not None else a.get_zorder()
+            elif isinstance(a, FastSpine):
+                zorder = a.get_zorder()
+            else:
+                continue
+            groups.setdefault(zorder, []).append(a)
+        return sorted(groups.items(), key=lambda item: item[0])
+
+    def _stroke_batching(self, renderer, groups):
+        return _StrokeBatching(self, renderer, groups)
+
+    def invalidate_decorations(self):
+        'Force the cached decoration bitmap to be rendered again on the next draw'
+        self._decoration_cache = None
+
+    def _decoration_artists(self):
+        artists = []
+        if self.axison and self._frameon:
+            artists.extend(self.spines.values())
+        if self.axison:
+            artists.extend([self.xaxis, self.yaxis])
+        return [a for a in artists if not is_blank(a)]
+
+    def _decoration_state(self, renderer):
+        'What the cached decoration bitmaps depend on, compared with ==, not hashed'
+        return (renderer.width, renderer.height,
+                self.xaxis._current_tick_state(),
+                self.yaxis._current_tick_state(),
+                _axis_label_state(self.xaxis), _axis_label_state(self.yaxis),
+                getattr(self.xaxis, '_gridOnMajor', None), getattr(self.xaxis, '_gridOnMinor', None),
+                getattr(self.yaxis, '_gridOnMajor', None), getattr(self.yaxis, '_gridOnMinor', None),
+                self.get_axisbelow(),
+                tuple(_spine_state(a) for a in self.spines.values()),
+                self.axison, self._frameon)
+
+    def _render_decorations(self, renderer, artists):
+        '''
+        Render artists into a transparent Agg buffer and return (x, y, image)
+        cropped to the painted pixels, or None
+        '''
+        offscreen = RendererAgg(renderer.width, renderer.height, renderer.dpi)
+        # drawn one after the other, so they make a single group
+        groups = [artists] if self._combine_decorations else []
+        with self._stroke_batching(offscreen, groups):
+            for a in artists:
+                a.draw(offscreen)
+        buf = numpy.frombuffer(offscreen.buffer_rgba(), numpy.uint8)
+        buf = buf.reshape(int(renderer.height), int(renderer.width), 4)
+
+        painted = buf[:, :, 3] != 0
+        rows = numpy.nonzero(painted.any(axis=1))[0]
+        cols = numpy.nonzero(painted.any(axis=0))[0]
+        if len(rows) == 0:
+            return None
+        r0, r1 = rows[0], rows[-1] + 1
+        c0, c1 = cols[0], cols[-1] + 1
+        # draw_image takes the lower left corner in display coordinates and
+        # the rows bottom up, while the Agg buffer is stored top down
+        image = buf[r1 - 1:r0 - 1 if r0 > 0 else None:-1, c0:c1].copy()
+        return c0, int(renderer.height) - r1, image
+
+    def _composited_children(self, images):
+        '''
+        get_children with the decoration artists replaced by the
+        DecorationImage of their group, where the first of them was.
+        '''
+        image_of = dict((id(a), image) for image in images for a in image.artists)
+        children = []
+        placed = set()
+        for a in super(FastAxes, self).get_children():
+            image = image_of.get(id(a))
+            if image is None:
+                children.append(a)
+            elif id(image) not in placed:
+                placed.add(id(image))
+                children.append(image)
+        return children
+
+    def draw(self, renderer=None, *args, **kwargs):
+        if (not self._cache_decorations or not self.get_visible()
+                or not isinstance(renderer, RendererAgg)):
+            groups = []
+            if self._combine_decorations and self.get_visible() and isinstance(renderer, RendererAgg):
+                groups = [group for zorder, group in self._decoration_groups(self._decoration_artists())]
+            with self._stroke_batching(renderer, groups):
+                return super(FastAxes, self).draw(renderer, *args, **kwargs)
+
+        state = self._decoration_state(renderer)
+        if self._decoration_cache is None or self._decoration_cache[0] != state:
+            images = [DecorationImage(zorder, group, self._render_decorations(renderer, group))
+                      for zorder, group in self._decoration_groups(self._decoration_artists())]
+            self._decoration_cache = (state, images)
+
+        # maxes.Axes.draw sorts the children by zorder, so each image is
+        # composited where its decorations would be drawn
+        images = self._decoration_cache[1]
+        self.get_children = functools.partial(self._composited_children, images)
+        try:
+            return super(FastAxes, self).draw(renderer, *args, **kwargs)
+        finally:
+            del self.get_children
+
     def _init_axis(self):
         "move this out of __init__ because non-separable axes don't use it"
         self.xaxis = FastXAxis(self)
+        self.yaxis = FastYAxis(self)
         self.spines['bottom'].register_axis(self.xaxis)
         self.spines['top'].register_axis(self.xaxis)
-        self.yaxis = FastYAxis(self)
         self.spines['left'].register_axis(self.yaxis)
         self.spines['right'].register_axis(self.yaxis)
         self._update_transScale()
 
+    def _gen_axes_spines(self, *args, **kwargs):
+        return collections.OrderedDict(
+                (side, FastSpine.linear_spine(self, side))
+                for side in ['left', 'right', 'bottom', 'top'])
+
 import matplotlib.projections as mp
 mp.projection_registry.register(FastAxes)
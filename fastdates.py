@@ -0,0 +1,277 @@
+"""
+Vectorized date tick location and formatting for fastaxes.
+
+num2datetime64 and strftime64 convert and format whole arrays of matplotlib
+date numbers with numpy datetime64 arithmetic, and locate_ticks computes the
+occurrences of the dateutil rules behind AutoDateLocator and the RRuleLocator
+family the same way.  Each gives the same result as matplotlib, or None (the
+locators fall back to calling the locator) where it does not replicate it:
+time zones other than UTC, weekday rules and unusual strftime directives.
+"""
+import datetime
+import numpy
+import matplotlib.dates as mdates
+
+def is_utc(tz):
+    return tz is None or tz.utcoffset(None) == datetime.timedelta(0)
+
+def _naive_utc(dt):
+    'dt without its tzinfo, or None when it is not in UTC'
+    if dt.tzinfo is None:
+        return dt
+    if dt.utcoffset() != datetime.timedelta(0):
+        return None
+    return dt.replace(tzinfo=None)
+
+# The conversion of a date number to a datetime has changed between
+# matplotlib versions, so the vectorized one has to replicate the rounding of
+# the installed mdates.num2date.  None where it is not replicated.
+if hasattr(mdates, 'get_epoch'):
+    _num2date_rounding = 'epoch'
+elif 'musec_prec' in mdates._from_ordinalf.__code__.co_varnames:
+    _num2date_rounding = None
+else:
+    _num2date_rounding = 'ordinal'
+
+def num2datetime64(x):
+    '''
+    Matplotlib date numbers as naive UTC datetime64[us], rounded as num2date
+    does, or None
+    '''
+    x = numpy.asarray(x, dtype=float)
+    if _num2date_rounding == 'epoch':
+        days = x
+        us = numpy.round(x * mdates.MUSECONDS_PER_DAY).astype(numpy.int64)
+        base = numpy.datetime64(mdates.get_epoch(), 'us')
+        # large numbers are rounded to 20 microseconds
+        big = numpy.abs(x) > 70 * 365
+        micro = us % 1000000
+        us[big] += (numpy.round(micro[big] / 20.) * 20).astype(numpy.int64) - micro[big]
+    elif _num2date_rounding == 'ordinal':
+        if (x < 1).any():
+            return None
+        days = numpy.trunc(x)
+        us = (days - 1).astype(numpy.int64) * 86400000000 + ((x - days) * mdates.MUSECONDS_PER_DAY).astype(numpy.int64)
+        base = numpy.datetime64('0001-01-01', 'us')
+        # compensate for rounding errors as _from_ordinalf does
+        micro = us % 1000000
+        us[micro < 10] -= micro[micro < 10]
+        us[micro > 999990] += 1000000 - micro[micro > 999990]
+    else:
+        return None
+    dt = base + us.astype('m8[us]')
+    if (dt < numpy.datetime64('1900-01-01')).any() or (dt >= numpy.datetime64('10000-01-01')).any():
+        return None
+    return dt
+
+def _date_fields(dt):
+    '''
+    The calendar fields of a datetime64[us] array as a dict of int arrays,
+    keyed by strftime directive letter.
+    '''
+    days = dt.astype('M8[D]')
+    months = dt.astype('M8[M]')
+    years = dt.astype('M8[Y]')
+    us = (dt - days).astype(numpy.int64)
+    seconds = us // 1000000
+    hours = seconds // 3600
+    return {'Y': years.astype(int) + 1970,
+            'm': months.astype(int) % 12 + 1,
+            'd': (days - months.astype('M8[D]')).astype(int) + 1,
+            'j': (days - years.astype('M8[D]')).astype(int) + 1,
+            'H': hours,
+            'M': seconds // 60 % 60,
+            'S': seconds % 60,
+            'f': us % 1000000,
+            # 1970-01-01 was a Thursday, and Monday is 0
+            'w': (days.astype(int) + 3) % 7}
+
+def _locale_names(directive, count, make):
+    'Names strftime gives for a directive, in the current locale'
+    return numpy.array([make(i).strftime(directive) for i in range(count)])
+
+_strftime_directive = {
+    'Y': lambda f: numpy.char.mod('%04d', f['Y']),
+    'y': lambda f: numpy.char.mod('%02d', f['Y'] % 100),
+    'm': lambda f: numpy.char.mod('%02d', f['m']),
+    'd': lambda f: numpy.char.mod('%02d', f['d']),
+    'j': lambda f: numpy.char.mod('%03d', f['j']),
+    'H': lambda f: numpy.char.mod('%02d', f['H']),
+    'I': lambda f: numpy.char.mod('%02d', (f['H'] + 11) % 12 + 1),
+    'M': lambda f: numpy.char.mod('%02d', f['M']),
+    'S': lambda f: numpy.char.mod('%02d', f['S']),
+    'f': lambda f: numpy.char.mod('%06d', f['f']),
+    'p': lambda f: _locale_names('%p', 2, lambda i: datetime.datetime(2000, 1, 1, 12 * i))[f['H'] // 12],
+    'b': lambda f: _locale_names('%b', 12, lambda i: datetime.datetime(2000, i + 1, 1))[f['m'] - 1],
+    'B': lambda f: _locale_names('%B', 12, lambda i: datetime.datetime(2000, i + 1, 1))[f['m'] - 1],
+    # 2000-01-03 was a Monday
+    'a': lambda f: _locale_names('%a', 7, lambda i: datetime.datetime(2000, 1, 3 + i))[f['w']],
+    'A': lambda f: _locale_names('%A', 7, lambda i: datetime.datetime(2000, 1, 3 + i))[f['w']],
+}
+
+def strftime64(fmt, dt):
+    '''
+    Format each date of a datetime64[us] array with the strftime format fmt.
+    Return None if fmt uses a directive that is not implemented.
+    '''
+    parts = []
+    fields = None
+    pos = 0
+    while True:
+        i = fmt.find('%', pos)
+        if i < 0:
+            parts.append(fmt[pos:])
+            break
+        parts.append(fmt[pos:i])
+        if i + 1 == len(fmt):
+            # a raw % at the end, which strftime rejects with ValueError on
+            # some versions of Python and keeps on others
+            parts.append(datetime.datetime(2000, 1, 1).strftime('%'))
+            break
+        directive = fmt[i + 1]
+        if directive == '%':
+            parts.append('%')
+        elif directive in _strftime_directive:
+            if fields is None:
+                fields = _date_fields(dt)
+            parts.append(_strftime_directive[directive](fields))
+        else:
+            return None
+        pos = i + 2
+    labels = numpy.array([''] * len(dt), dtype=object)
+    for p in parts:
+        labels = labels + (p if isinstance(p, str) else p.astype(object))
+    return labels.tolist()
+
+# fields of a datetime from the coarsest, indexed by dateutil frequency
+_RRULE_UNITS = ['Y', 'M', 'W', 'D', 'h', 'm', 's']
+_RRULE_FIELDS = ['_bymonth', '_bymonthday', '_byhour', '_byminute', '_bysecond']
+
+def rrule_between(rule, after, before):
+    '''
+    The occurrences of the dateutil rrule in [after, before] as naive UTC
+    datetime64[s], or None for rules it does not replicate
+    '''
+    if rule._freq == 2 or rule._byweekday or rule._bynweekday or rule._byyearday \
+            or rule._byweekno or rule._byeaster or rule._bysetpos or rule._bynmonthday:
+        return None
+    if not is_utc(rule._tzinfo):
+        return None
+    dtstart, after, before = _naive_utc(rule._dtstart), _naive_utc(after), _naive_utc(before)
+    until = before if rule._until is None else _naive_utc(rule._until)
+    if dtstart is None or after is None or before is None or until is None:
+        return None
+    # dateutil drops the microseconds of dtstart, but not of the others
+    dtstart = numpy.datetime64(dtstart.replace(microsecond=0), 's')
+    after, before, until = [numpy.datetime64(d, 'us') for d in (after, before, until)]
+    last = min(until, before)
+
+    unit = _RRULE_UNITS[rule._freq]
+    first = dtstart.astype('M8[%s]' % unit)
+    count = (last.astype('M8[%s]' % unit) - first).astype(numpy.int64) // rule._interval + 1
+    if count > 100000:
+        return None
+    periods = first + numpy.arange(max(count, 0)) * numpy.timedelta64(rule._interval, unit)
+
+    # The fields coarser than the frequency come from the period and are
+    # filtered by the by-sets, the finer ones are expanded from the by-sets
+    # (which dateutil has defaulted from dtstart).
+    fields = _date_fields(periods.astype('M8[us]'))
+    level = {'Y': 0, 'M': 1, 'D': 2, 'h': 3, 'm': 4, 's': 5}[unit]
+    names = ['m', 'd', 'H', 'M', 'S']
+    keep = numpy.ones(len(periods), dtype=bool)
+    columns = [[fields['Y']]]
+    for i, (attr, name) in enumerate(zip(_RRULE_FIELDS, names)):
+        by = getattr(rule, attr)
+        if i < level:
+            if by:
+                keep &= (fields[name][:, None] == numpy.array(sorted(by))).any(axis=1)
+            columns.append([fields[name]])
+        else:
+            if not by:
+                return None
+            columns.append(sorted(by))
+
+    occurrences = []
+    for y, m, d, H, M, S in _product(columns):
+        months = (numpy.asarray(y) - 1970) * 12 + numpy.asarray(m) - 1
+        months = months.astype('M8[M]')
+        days = months.astype('M8[D]') + (numpy.asarray(d) - 1)
+        t = days.astype('M8[s]') + (numpy.asarray(H) * 3600 + numpy.asarray(M) * 60 + numpy.asarray(S))
+        t = numpy.broadcast_to(t, periods.shape)
+        # drop days beyond the end of the month
+        valid = keep & (days.astype('M8[M]') == months)
+        occurrences.append(t[valid])
+    t = numpy.sort(numpy.concatenate(occurrences)) if occurrences else numpy.array([], dtype='M8[s]')
+    t = t[(t >= dtstart) & (t <= until)]
+    if rule._count is not None:
+        t = t[:rule._count]
+    return t[(t >= after) & (t <= before)]
+
+def _product(columns):
+    if not columns:
+        yield ()
+        return
+    for head in columns[0]:
+        for tail in _product(columns[1:]):
+            yield (head,) + tail
+
+class _VectorRRule(object):
+    '''
+    Stand-in for the rrulewrapper of an RRuleLocator while it is called,
+    answering between() with rrule_between.
+    '''
+    def __init__(self, wrapper):
+        self.__dict__['_wrapper'] = wrapper
+
+    def __getattr__(self, name):
+        return getattr(self._wrapper, name)
+
+    def between(self, after, before, inc=False):
+        t = None
+        if inc:
+            t = rrule_between(self._wrapper._rrule, after, before)
+        if t is None:
+            return self._wrapper.between(after, before, inc)
+        if hasattr(mdates, 'get_epoch'):
+            # date2num takes datetime64 directly
+            return t.astype('M8[us]')
+        return t.astype(datetime.datetime).tolist()
+
+def _locate_rrule(locator):
+    rule = locator.rule
+    locator.rule = _VectorRRule(rule)
+    try:
+        return locator()
+    finally:
+        locator.rule = rule
+
+def _locate_auto_dates(locator):
+    if hasattr(locator, 'refresh'):
+        # matplotlib 1.x keeps the chosen locator
+        locator.refresh()
+        sub = locator._locator
+    else:
+        sub = locator.get_locator(*locator.viewlim_to_dt())
+    return locate_ticks(sub)
+
+# Like _batch_formatters, implementations of locator calls keyed by exact type
+def _function(method):
+    'The function of a method, bound or not (unbound methods are new objects on py2)'
+    return getattr(method, '__func__', method)
+
+_batch_locators = {mdates.AutoDateLocator: _locate_auto_dates}
+for _cls in vars(mdates).values():
+    if isinstance(_cls, type) and issubclass(_cls, mdates.RRuleLocator) \
+            and _function(_cls.__call__) is _function(mdates.RRuleLocator.__call__):
+        _batch_locators[_cls] = _locate_rrule
+
+def locate_ticks(locator):
+    '''
+    The tick locations of locator, which are the same as those of locator().
+    The date locators driven by dateutil rules compute them with numpy.
+    '''
+    batch = _batch_locators.get(type(locator))
+    if batch is None:
+        return locator()
+    return batch(locator)
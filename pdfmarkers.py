@@ -0,0 +1,47 @@
+"""
+Sharing of marker XObjects between the draw_markers calls of a PDF file.
+
+PdfFile keys its markers by Verbatim path operations, which compare by identity;
+a PdfMarkerIndex keys them by the operations and the marker style instead.
+"""
+
+class PdfMarkerIndex(object):
+    'A markerObject for a PdfFile sharing one XObject between equal markers'
+    def __init__(self, pdf_file):
+        self.file = pdf_file
+        self._marker_object = pdf_file.markerObject
+        # our key -> key of the entry in pdf_file.markers
+        self._keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, path, trans, fill, stroke, lw, joinstyle, capstyle):
+        pathops = self.file.pathOperations(path, trans, simplify=False)
+        key = (tuple(getattr(op, '_x', op) for op in pathops),
+               bool(fill), bool(stroke), joinstyle, capstyle)
+        entry = self.file.markers.get(self._keys.get(key))
+        if entry is not None:
+            self.hits += 1
+            # the bounding box of the XObject allows for the widest line
+            if entry[-1] < lw:
+                entry[-1] = lw
+            return entry[0]
+
+        self.misses += 1
+        before = set(self.file.markers)
+        name = self._marker_object(path, trans, fill, stroke, lw, joinstyle, capstyle)
+        added = set(self.file.markers) - before
+        if len(added) == 1:
+            self._keys[key] = added.pop()
+        return name
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._keys)}
+
+def index_pdf_markers(pdf_file):
+    'Make pdf_file.markerObject a PdfMarkerIndex and return it'
+    index = pdf_file.__dict__.get('markerObject')
+    if not isinstance(index, PdfMarkerIndex):
+        index = PdfMarkerIndex(pdf_file)
+        pdf_file.markerObject = index
+    return index
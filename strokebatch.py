@@ -0,0 +1,209 @@
+"""
+Merging of the strokes drawn on a renderer into as few paths as possible.
+
+A StrokeBatch installed on a renderer collects its draw_path and draw_markers
+calls, and flush makes them again with the strokes of the same graphics context
+state merged into one path, where the first of them was drawn.  Only paths
+which Agg snaps alike are merged, and shared pixels of merged strokes are
+covered once rather than blended twice.
+"""
+import numpy
+import matplotlib.artist as martist
+import matplotlib.path as mpath
+import matplotlib.spines as mspines
+import matplotlib.transforms as mtransforms
+
+def _same_state(state, other):
+    'True if two snapshots of the attributes of graphics contexts are equal'
+    try:
+        return bool(state == other)
+    except ValueError:
+        # dashes given as an array
+        return False
+
+def _rectilinear(vertices, codes):
+    'True if every line segment of a path in display coordinates is horizontal or vertical'
+    if len(vertices) <= 8:
+        # segments ending in a moveto or touching a NaN are no line segments
+        # (NaN compares false)
+        points = vertices.tolist()
+        for i in range(1, len(points)):
+            if codes is not None and codes[i] != mpath.Path.LINETO:
+                continue
+            (x0, y0), (x1, y1) = points[i - 1], points[i]
+            if abs(x1 - x0) >= 1e-4 and abs(y1 - y0) >= 1e-4:
+                return False
+        return True
+    dx = numpy.abs(numpy.diff(vertices[:, 0]))
+    dy = numpy.abs(numpy.diff(vertices[:, 1]))
+    slanted = (dx >= 1e-4) & (dy >= 1e-4)
+    if codes is not None:
+        slanted &= codes[1:] == mpath.Path.LINETO
+    return not slanted.any()
+
+def spine_style(spine):
+    'The properties a straight spine draws with, or None if it needs the whole of Spine.draw'
+    if (getattr(spine, '_patch_type', 'line') != 'line' or spine.get_path_effects()
+            or spine.get_agg_filter() is not None or spine.get_rasterized()
+            or spine.get_sketch_params() is not None or spine.get_hatch()):
+        return None
+    style = (tuple(spine.get_edgecolor()), tuple(spine.get_facecolor()), spine.get_fill(),
+             spine.get_linewidth(), spine.get_linestyle(),
+             spine.get_capstyle(), spine.get_joinstyle(),
+             spine.get_alpha(), spine.get_antialiased(), spine.get_snap(),
+             spine.get_clip_on(), spine.get_clip_box(), spine.get_clip_path(),
+             spine.get_url(), spine.get_gid())
+    try:
+        hash(style)
+    except TypeError:
+        # a dash sequence
+        return None
+    return style
+
+def _spine_vertices(spine):
+    'The vertices of a straight spine in display coordinates'
+    if (spine._position in (None, ('outward', 0)) and spine._bounds is None
+            and not getattr(spine, '_smart_bounds', False)):
+        # a spine at the edge of the axes spanning the view, as placed by
+        # Spine._adjust_location
+        x0, y0, x1, y1 = spine.axes.bbox.extents
+        if spine.spine_type == 'left':
+            return numpy.array([[x0, y0], [x0, y1]])
+        if spine.spine_type == 'right':
+            return numpy.array([[x1, y0], [x1, y1]])
+        if spine.spine_type == 'bottom':
+            return numpy.array([[x0, y0], [x1, y0]])
+        if spine.spine_type == 'top':
+            return numpy.array([[x0, y1], [x1, y1]])
+    spine._adjust_location()
+    # the patch transform of a straight spine is the identity
+    return martist.Artist.get_transform(spine).transform(spine.get_path().vertices)
+
+def _draw_spine_path(spine, renderer, path):
+    'Draw spine with path, in display coordinates, in place of its own'
+    # already adjusted by add_spine
+    spine._adjust_location = lambda: None
+    spine.get_path = lambda: path
+    spine.get_transform = mtransforms.IdentityTransform
+    try:
+        mspines.Spine.draw(spine, renderer)
+    finally:
+        del spine._adjust_location, spine.get_path, spine.get_transform
+
+class StrokeBatch(object):
+    'Collects the strokes drawn on a renderer and draws those of one style as one path'
+    # RendererAgg does not snap longer paths
+    snap_vertices = 1024
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        # [method, gc state, paths, args...] in the order of the calls
+        self._calls = []
+        # (snap, should_simplify, simplify_threshold) -> the calls of that
+        # kind still growing
+        self._open = {}
+        # spine style -> ['spines', spine drawing them, paths]
+        self._spines = {}
+        # the instance attributes replaced by install (RendererAgg binds
+        # draw_markers to its C++ renderer), or None
+        self._saved = None
+        self.calls = 0
+        self.made = 0
+
+    def install(self):
+        if self._saved is None:
+            renderer = self.renderer
+            self._saved = dict((name, vars(renderer)[name]) for name in ('draw_path', 'draw_markers')
+                               if name in vars(renderer))
+            renderer.draw_path = self.draw_path
+            renderer.draw_markers = self.draw_markers
+
+    def uninstall(self):
+        if self._saved is not None:
+            del self.renderer.draw_path
+            del self.renderer.draw_markers
+            vars(self.renderer).update(self._saved)
+            self._saved = None
+
+    def _stroke(self, gc, path, transform, rgbFace):
+        '''
+        The kind of a draw_path call which may be merged with others and its
+        vertices in display coordinates, or (None, None).
+        '''
+        if rgbFace is not None or gc.get_hatch() is not None or not transform.is_affine:
+            return None, None
+        codes = path.codes
+        if codes is not None and (codes > mpath.Path.LINETO).any():
+            return None, None
+        vertices = transform.transform_affine(path.vertices)
+        snap = gc.get_snap()
+        if snap is None:
+            snap = len(vertices) <= self.snap_vertices and _rectilinear(vertices, codes)
+        return (snap, path.should_simplify, path.simplify_threshold), vertices
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        self.calls += 1
+        # the artist may change its gc after the call
+        state = dict(vars(gc))
+        kind, vertices = self._stroke(gc, path, transform, rgbFace)
+        if kind is not None:
+            calls = self._open.setdefault(kind, [])
+            for call in calls:
+                if _same_state(call[1], state):
+                    if not (kind[0] and call[3] + len(vertices) > self.snap_vertices):
+                        call[2].append((path, transform, vertices))
+                        call[3] += len(vertices)
+                        return
+                    calls.remove(call)
+                    break
+            calls.append(['draw_path', state, [(path, transform, vertices)],
+                          len(vertices), kind, rgbFace])
+            self._calls.append(calls[-1])
+        else:
+            self._calls.append(['draw_path', state, [(path, transform, None)], 0, None, rgbFace])
+
+    def draw_markers(self, gc, marker_path, marker_trans, path, trans, rgbFace=None):
+        self.calls += 1
+        self._calls.append(['draw_markers', dict(vars(gc)), None,
+                            marker_path, marker_trans, path, trans, rgbFace])
+
+    def add_spine(self, spine, style):
+        '''
+        Record a straight spine with the style given by spine_style.  The
+        first spine of each style draws the paths of all of them.
+        '''
+        self.calls += 1
+        entry = self._spines.get(style)
+        if entry is None:
+            entry = self._spines[style] = ['spines', spine, []]
+            self._calls.append(entry)
+        entry[2].append(_spine_vertices(spine))
+
+    def flush(self):
+        'Make the collected calls on the renderer'
+        self.uninstall()
+        calls, self._calls, self._open, self._spines = self._calls, [], {}, {}
+        renderer = self.renderer
+        for call in calls:
+            if call[0] == 'spines':
+                codes = numpy.full(sum(len(v) for v in call[2]), mpath.Path.LINETO, mpath.Path.code_type)
+                codes[numpy.cumsum([0] + [len(v) for v in call[2][:-1]])] = mpath.Path.MOVETO
+                path = mpath.Path(numpy.concatenate(call[2]), codes)
+                _draw_spine_path(call[1], renderer, path)
+                self.made += 1
+                continue
+            gc = renderer.new_gc()
+            vars(gc).update(call[1])
+            if call[0] == 'draw_markers':
+                renderer.draw_markers(gc, *call[3:])
+            elif len(call[2]) == 1:
+                path, transform, vertices = call[2][0]
+                renderer.draw_path(gc, path, transform, call[5])
+            else:
+                merged = mpath.Path.make_compound_path(*[
+                        mpath.Path(vertices, path.codes) for path, transform, vertices in call[2]])
+                merged.should_simplify = call[4][1]
+                merged.simplify_threshold = call[4][2]
+                renderer.draw_path(gc, merged, mtransforms.IdentityTransform(), call[5])
+            gc.restore()
+            self.made += 1
@@ -1,21 +1,38 @@
 from __future__ import print_function
+import io
 import os
-import time
-import tempfile
+import sys
+import json
+import timeit
+import argparse
 import datetime
+import collections
 import cProfile
 import numpy
 import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates
 import matplotlib.ticker
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from matplotlib.figure import Figure
 import fastaxes as f
 
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
 import matplotlib.style as style
 #style.use('ggplot')
 
 POINTS = 500
 
+# projection used for the fast column
+FAST_PROJ = 'fastticks'
+
+# phases measured with --vector
+VECTOR_FORMATS = ('svg', 'pdf')
+
 def vanilla(proj=None):
     figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
     ax = figure.add_subplot(1, 1, 1, projection=proj)
@@ -114,6 +131,19 @@ def tickless(proj=None):
 
     return figure
 
+def grid(proj=None):
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    scat = ax.scatter(numpy.arange(POINTS), numpy.sin(numpy.arange(POINTS)))
+
+    ticks = 40
+    ax.xaxis.set_minor_locator(matplotlib.ticker.LinearLocator(ticks))
+    ax.yaxis.set_minor_locator(matplotlib.ticker.LinearLocator(ticks))
+    ax.grid(True, which='both')
+
+    return figure
+
 def large_grid(proj=None):
     figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
 
@@ -127,6 +157,128 @@ def large_grid(proj=None):
 
     return figure
 
+def dates(proj=None):
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    start = datetime.datetime(2015, 1, 1)
+    x = [start + datetime.timedelta(hours=i) for i in range(POINTS)]
+    lines = ax.plot(x, numpy.sin(numpy.arange(POINTS) / 20.))
+
+    return figure
+
+def intraday(proj=None):
+    # one trading day of minute samples; hourly and minute date ticks
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    start = datetime.datetime(2015, 3, 2, 9, 30)
+    x = [start + datetime.timedelta(minutes=i) for i in range(390)]
+    ax.plot(x, numpy.cumsum(numpy.sin(numpy.arange(390) / 7.)))
+    ax.xaxis.set_minor_locator(matplotlib.dates.MinuteLocator(byminute=range(0, 60, 10)))
+
+    return figure
+
+def dashboard(proj=None):
+    # a grid of daily time series panels
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+
+    start = datetime.datetime(2014, 1, 1)
+    x = [start + datetime.timedelta(days=i) for i in range(POINTS)]
+    for i in range(6):
+        ax = figure.add_subplot(3, 2, i + 1, projection=proj)
+        ax.plot(x, numpy.sin(numpy.arange(POINTS) / (10. + i)))
+        ax.xaxis.set_major_formatter(matplotlib.dates.DateFormatter('%b %y'))
+        ax.xaxis.set_minor_locator(matplotlib.dates.MonthLocator())
+
+    return figure
+
+def twin(proj=None):
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    x = numpy.arange(POINTS)
+    ax.plot(x, numpy.sin(x / 20.), 'r-')
+    ax2 = ax.twinx()
+    ax2.plot(x, numpy.exp(x / 100.), 'b-')
+
+    return figure
+
+def twinboth(proj=None):
+    # twinx and twiny on one axes, with labels on all four sides
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0), tight_layout=True)
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    x = numpy.arange(POINTS)
+    ax.plot(x, numpy.sin(x / 20.), 'r-')
+    ax.set_xlabel('samples')
+    ax.set_ylabel('sin')
+    ax2 = ax.twinx()
+    ax2.plot(x, numpy.exp(x / 100.), 'b-')
+    ax2.set_ylabel('exp')
+    ax3 = ax.twiny()
+    ax3.set_xlim(0, POINTS / 60.)
+    ax3.set_xlabel('minutes')
+
+    return figure
+
+def shared(proj=None):
+    # stacked panels sharing one x axis
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+
+    x = numpy.arange(POINTS)
+    first = None
+    for i in range(6):
+        ax = figure.add_subplot(6, 1, i + 1, projection=proj, sharex=first)
+        ax.plot(x, numpy.sin(x / (10. + i)))
+        ax.minorticks_on()
+        first = first or ax
+
+    return figure
+
+def heatmap(proj=None):
+    # an image with a colorbar, which takes the projection of its axes
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0), tight_layout=True)
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    x, y = numpy.meshgrid(numpy.linspace(-3, 3, 200), numpy.linspace(-3, 3, 200))
+    image = ax.imshow(numpy.sin(x * y), extent=(-3, 3, -3, 3), interpolation='nearest')
+    figure.colorbar(image, ax=ax)
+    ax.set_xlabel('x')
+    ax.set_ylabel('y')
+
+    return figure
+
+def colorbars(proj=None):
+    # a grid of small pcolormesh plots, each with its own colorbar
+    figure = Figure(figsize=(8, 8), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+
+    data = numpy.random.RandomState(0).rand(16, 12, 12)
+    for i in range(16):
+        ax = figure.add_subplot(4, 4, i + 1, projection=proj)
+        mesh = ax.pcolormesh(data[i] * (i + 1))
+        figure.colorbar(mesh, ax=ax)
+
+    return figure
+
+def bigticks(proj=None):
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+
+    scat = ax.scatter(numpy.arange(POINTS), numpy.sin(numpy.arange(POINTS)))
+
+    ax.xaxis.set_major_locator(matplotlib.ticker.LinearLocator(51))
+    ax.yaxis.set_major_locator(matplotlib.ticker.LinearLocator(51))
+    ax.xaxis.set_minor_locator(matplotlib.ticker.LinearLocator(401))
+    ax.yaxis.set_minor_locator(matplotlib.ticker.LinearLocator(401))
+
+    return figure
+
+SCENARIOS = collections.OrderedDict((func.__name__, func) for func in [
+        vanilla, labeled, t_labels, hexplot, large_grid, log, tight, tightlog,
+        manyticks, tickless, grid, dates, intraday, dashboard, twin, twinboth,
+        shared, heatmap, colorbars, bigticks])
+
 
 class Profile(object):
     def __init__(self, label):
@@ -141,56 +293,190 @@ class Profile(object):
         filename = '{}-{}.prof'.format(self.label, datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
         self.pr.dump_stats(filename)
 
-def speed(func):
-    start = time.time()
-    s_fig = func()
-    s_create_time = time.time() - start
-    s_canvas = FigureCanvas(s_fig)
-    start = time.time()
-    f_fig = func(proj='fastticks')
-    f_create_time = time.time() - start
-    f_canvas = FigureCanvas(f_fig)
-
-    # heat the cache or other first-run issues
-    f_canvas.print_to_buffer()
-    s_canvas.print_to_buffer()
-
-    ITER=6
-
-    start = time.time()
-    for i in range(ITER):
-        s_canvas.print_to_buffer()
-    s_time = time.time() - start
-
-    start = time.time()
-    for i in range(ITER):
-        f_canvas.print_to_buffer()
-    f_time = time.time() - start
-
-    with Profile(func.__name__):
-        f_canvas.print_to_buffer()
-
-    s_fname = os.path.join('images', '{}.png'.format(func.__name__))
-    s_fig.savefig(s_fname)
-    f_fname = os.path.join('images', '{}-fast.png'.format(func.__name__))
-    f_fig.savefig(f_fname)
-
-    identical = open(s_fname, 'rb').read() == open(f_fname, 'rb').read()
-    print('{:<10s}:  {:>5.2f}({:>5.2f}) {:>5.2f}({:>5.2f}) ({:>4.1f}x faster) Identical:  {}'.format(func.__name__, s_time, s_create_time, f_time, f_create_time, s_time / f_time, identical))
-
-def main():
-    print('{:<10s}:  {:>5s}({:>5s}) {:>5s}({:>5s})'.format('func', 'std', 'make', 'fast', 'make'))
-
-    speed(vanilla)
-    speed(labeled)
-    speed(t_labels)
-    speed(hexplot)
-    speed(large_grid)
-    speed(log)
-    speed(tight)
-    speed(tightlog)
-    speed(manyticks)
-    speed(tickless)
+def summarize(times):
+    times = numpy.asarray(times)
+    return {'median': float(numpy.median(times)),
+            'p95': float(numpy.percentile(times, 95)),
+            'stddev': float(numpy.std(times)),
+            'min': float(times.min()),
+            'runs': len(times)}
+
+def timed(fn, repeat, warmup):
+    'Call fn warmup times untimed and then repeat times timed; return the summary'
+    for i in range(warmup):
+        fn()
+    times = []
+    for i in range(repeat):
+        start = timeit.default_timer()
+        fn()
+        times.append(timeit.default_timer() - start)
+    return summarize(times)
+
+def peak_memory(func, proj=None):
+    'Peak memory in MB allocated while constructing the figure (nan without tracemalloc)'
+    if tracemalloc is None:
+        return float('nan')
+    tracemalloc.start()
+    func(proj=proj)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return peak
+
+def vector_output(fig, fmt, repeat, warmup):
+    'Time writing fig as fmt (svg or pdf); the summary also has the file size in bytes'
+    sizes = []
+    def write():
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt)
+        sizes.append(len(buf.getvalue()))
+    result = timed(write, repeat, warmup)
+    result['bytes'] = sizes[-1]
+    return result
+
+def measure(func, proj, repeat, warmup, vector=False):
+    '''
+    Time the create, draw and savefig phases of a scenario separately, and
+    with vector the svg and pdf output.  Return the phase summaries and the
+    figure of the last construction.
+    '''
+    figs = []
+    create = timed(lambda: figs.append(func(proj=proj)), repeat, warmup)
+    fig = figs[-1]
+    del figs[:]
+    canvas = FigureCanvas(fig)
+    draw = timed(canvas.draw, repeat, warmup)
+    savefig = timed(lambda: fig.savefig(io.BytesIO(), format='png'), repeat, warmup)
+    result = {'create': create, 'draw': draw, 'savefig': savefig,
+              'peak_mb': peak_memory(func, proj)}
+    if vector:
+        for fmt in VECTOR_FORMATS:
+            result[fmt] = vector_output(fig, fmt, repeat, warmup)
+    return result, fig
+
+def render(fig):
+    canvas = FigureCanvas(fig)
+    canvas.draw()
+    # buffer_rgba is flat bytes on matplotlib 1.5 and 2.0
+    renderer = canvas.get_renderer()
+    pixels = numpy.frombuffer(canvas.buffer_rgba(), numpy.uint8)
+    pixels = pixels.reshape(int(renderer.height), int(renderer.width), 4)
+    return pixels[:, :, :3].astype(float)
+
+def pixel_diff(s_fig, f_fig):
+    '''
+    Compare two figures rendered with Agg.  Return the RMS difference and the
+    maximum difference of any channel (0-255); both are inf if the sizes differ.
+    '''
+    a = render(s_fig)
+    b = render(f_fig)
+    if a.shape != b.shape:
+        return float('inf'), float('inf')
+    diff = a - b
+    return float(numpy.sqrt(numpy.mean(diff ** 2))), float(numpy.abs(diff).max())
+
+def compare(results, baseline, threshold):
+    '''
+    Compare the median times of results against a baseline and return a list
+    of (scenario, column, phase, old, new) for the ones slower by more than the
+    threshold fraction.
+    '''
+    regressions = []
+    for name, result in results.items():
+        for column in ('std', 'fast'):
+            for phase in ('create', 'draw', 'savefig') + VECTOR_FORMATS:
+                try:
+                    old = baseline[name][column][phase]['median']
+                except KeyError:
+                    continue
+                new = result[column][phase]['median']
+                if new > old * (1. + threshold):
+                    regressions.append((name, column, phase, old, new))
+    return regressions
+
+def speed(func, repeat, warmup, tolerance, save_images=False, profile=False, vector=False):
+    s_result, s_fig = measure(func, None, repeat, warmup, vector)
+    f_result, f_fig = measure(func, FAST_PROJ, repeat, warmup, vector)
+
+    if profile:
+        f_canvas = FigureCanvas(f_fig)
+        with Profile(func.__name__):
+            f_canvas.draw()
+
+    if save_images:
+        s_fig.savefig(os.path.join('images', '{}.png'.format(func.__name__)))
+        f_fig.savefig(os.path.join('images', '{}-fast.png'.format(func.__name__)))
+
+    rms, maxdiff = pixel_diff(s_fig, f_fig)
+    result = {'std': s_result, 'fast': f_result,
+              'rms': rms, 'maxdiff': maxdiff, 'match': rms <= tolerance}
+
+    s_draw = s_result['draw']['median']
+    f_draw = f_result['draw']['median']
+    print('{:<10s}:  {:>6.3f}({:>6.3f} {:>6.3f} {:>6.1f}M)  {:>6.3f}({:>6.3f} {:>6.3f} {:>6.1f}M) ({:>4.1f}x faster) RMS: {:>5.2f} Match: {}'.format(
+            func.__name__,
+            s_draw, s_result['create']['median'], s_result['savefig']['median'], s_result['peak_mb'],
+            f_draw, f_result['create']['median'], f_result['savefig']['median'], f_result['peak_mb'],
+            s_draw / f_draw, rms, result['match']))
+    for fmt in VECTOR_FORMATS if vector else ():
+        s_out, f_out = s_result[fmt], f_result[fmt]
+        print('{:>10s}:  {:>6.3f}({:>7.1f}K)         {:>6.3f}({:>7.1f}K)         ({:>4.1f}x faster) size: {:>4.0f}%'.format(
+                fmt, s_out['median'], s_out['bytes'] / 1e3, f_out['median'], f_out['bytes'] / 1e3,
+                s_out['median'] / f_out['median'], 100. * f_out['bytes'] / s_out['bytes']))
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark fastticks axes against standard axes on Agg')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run (default all): {}'.format(', '.join(SCENARIOS)))
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per phase')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per phase')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='RMS pixel difference treated as a match')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown fraction against the baseline reported as a regression')
+    parser.add_argument('--save-images', action='store_true', help='save both renderings of each scenario into images/')
+    parser.add_argument('--profile', action='store_true', help='dump a cProfile of one fast draw per scenario')
+    parser.add_argument('--vector', action='store_true', help='also time svg and pdf output and report the file sizes')
+    parser.add_argument('--combine', action='store_true', help='draw the fast axes with set_combine_decorations(True)')
+    args = parser.parse_args(argv)
+
+    if args.combine:
+        # the default of set_combine_decorations
+        f.FastAxes._combine_decorations = True
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error('unknown scenarios: {}'.format(', '.join(unknown)))
+
+    print('median seconds of draw(create savefig) and peak construction memory')
+    if args.vector:
+        print('followed by the median seconds(size) of svg and pdf output, size relative to std')
+    print('{:<10s}:  {:>6s}({:>6s} {:>6s} {:>7s})  {:>6s}({:>6s} {:>6s} {:>7s})'.format(
+            'func', 'std', 'make', 'save', 'peak', 'fast', 'make', 'save', 'peak'))
+
+    results = collections.OrderedDict()
+    for name in names:
+        results[name] = speed(SCENARIOS[name], args.repeat, args.warmup, args.tolerance,
+                              save_images=args.save_images, profile=args.profile, vector=args.vector)
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'matplotlib': matplotlib.__version__,
+                       'fast_projection': FAST_PROJ,
+                       'combine_decorations': args.combine,
+                       'repeat': args.repeat,
+                       'warmup': args.warmup,
+                       'results': results}, fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, column, phase, old, new in regressions:
+            print('REGRESSION {:<10s} {:<4s} {:<7s}: {:.3f} -> {:.3f} ({:+.0f}%)'.format(
+                    name, column, phase, old, new, 100. * (new / old - 1.)))
+        if regressions:
+            return 1
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import os
+import functools
+import numpy
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+import fastaxes
+import batchexport
+
+def build(n, figsize=(3, 2)):
+    figure = Figure(figsize=figsize, dpi=72)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.plot(numpy.arange(10), numpy.arange(10) * n)
+    return figure
+
+def broken():
+    raise ValueError('no figure')
+
+def dies():
+    os._exit(1)
+
+def cold():
+    raise RuntimeError('cannot warm up')
+
+def test_render_many(tmpdir):
+    paths = [str(tmpdir.join('fig%d.png' % n)) for n in range(6)]
+    jobs = [(functools.partial(build, n), path) for n, path in enumerate(paths)]
+    results = list(batchexport.render_many(jobs, processes=2, max_in_flight=3))
+    assert sorted(r.path for r in results) == sorted(paths)
+    assert all(r.error is None for r in results)
+    assert all(os.path.getsize(path) > 0 for path in paths)
+
+def test_failed_jobs_are_reported(tmpdir):
+    good = str(tmpdir.join('good.png'))
+    jobs = [(broken, str(tmpdir.join('broken.png'))),
+            # a lambda cannot be pickled to the worker
+            (lambda: build(1), str(tmpdir.join('lambda.png'))),
+            (functools.partial(build, 2), good)]
+    results = dict((r.path, r) for r in batchexport.render_many(jobs, processes=2))
+    assert len(results) == 3
+    assert 'no figure' in results[str(tmpdir.join('broken.png'))].error
+    assert results[str(tmpdir.join('lambda.png'))].error
+    assert results[good].error is None
+
+def test_dead_worker_is_reported(tmpdir):
+    good = [str(tmpdir.join('good%d.png' % n)) for n in range(3)]
+    jobs = [(functools.partial(build, n), path) for n, path in enumerate(good)]
+    jobs.insert(1, (dies, str(tmpdir.join('dies.png'))))
+    results = dict((r.path, r) for r in batchexport.render_many(jobs, processes=2))
+    assert len(results) == 4
+    assert 'died' in results[str(tmpdir.join('dies.png'))].error
+    assert all(results[path].error is None for path in good)
+
+def test_warm_up_errors_are_reported(tmpdir):
+    # the workers fork with the module state of the test process
+    warm_worker, warmed = batchexport._warm_worker, batchexport._warmed
+    batchexport._warm_worker, batchexport._warmed = cold, False
+    try:
+        paths = [str(tmpdir.join('fig%d.png' % n)) for n in range(2)]
+        jobs = [(functools.partial(build, n), path) for n, path in enumerate(paths)]
+        first, second = batchexport.render_many(jobs, processes=1)
+    finally:
+        batchexport._warm_worker, batchexport._warmed = warm_worker, warmed
+    assert 'cannot warm up' in first.error
+    assert second.error is None
+
+def test_renderer_reused_at_savefig_dpi(tmpdir):
+    batchexport._renderers.clear()
+    kwargs = {'dpi': 50}
+    batchexport._export((functools.partial(build, 1), str(tmpdir.join('a.png')), kwargs))
+    (key, (renderer, last_key)), = batchexport._renderers.items()
+    assert key == ((3, 2), 50)
+    assert (int(renderer.width), int(renderer.height)) == (150, 100)
+
+    batchexport._export((functools.partial(build, 2), str(tmpdir.join('b.png')), kwargs))
+    assert batchexport._renderers[key][0] is renderer
+
+    batchexport._export((functools.partial(build, 2, (4, 2)), str(tmpdir.join('c.png')), kwargs))
+    assert list(batchexport._renderers) == [((4, 2), 50)]
+    batchexport._renderers.clear()
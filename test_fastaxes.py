@@ -0,0 +1,490 @@
+import numpy
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.ticker as mticker
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import fastaxes
+
+def pixels(canvas):
+    canvas.draw()
+    renderer = canvas.get_renderer()
+    buf = numpy.frombuffer(canvas.buffer_rgba(), numpy.uint8)
+    return buf.reshape(int(renderer.height), int(renderer.width), 4).copy()
+
+def sine(proj):
+    figure = Figure(figsize=(3, 3), dpi=72, facecolor=(1, 1, 1))
+    ax = figure.add_subplot(1, 1, 1, projection=proj)
+    ax.plot(numpy.arange(20), numpy.sin(numpy.arange(20)))
+    return figure, ax
+
+def test_first_draw_same_as_redraw():
+    figure, ax = sine('fastticks')
+    canvas = FigureCanvasAgg(figure)
+    first = pixels(canvas)
+    assert numpy.array_equal(first, pixels(canvas))
+
+def test_first_draw_keeps_tick_state():
+    # the default spine positions are set on construction, not by the first
+    # draw, whose reset_ticks would drop the tick state it builds
+    figure, ax = sine('fastticks')
+    assert all(spine._position is not None for spine in ax.spines.values())
+    ax.yaxis.set_streaming(True)
+    invalidated = []
+    ax.yaxis.invalidate_ticks = lambda: invalidated.append(True)
+    FigureCanvasAgg(figure).draw()
+    assert invalidated == []
+
+def test_spines_positioned_like_standard_axes():
+    # Axis.reset_ticks positions the spines through the Tick it builds
+    (standard_figure, standard), (fast_figure, fast) = sine(None), sine('fastticks')
+    for side in ['left', 'right', 'bottom', 'top']:
+        assert fast.spines[side].get_position() == standard.spines[side].get_position()
+    for figure, ax in [(standard_figure, standard), (fast_figure, fast)]:
+        ax.spines['left'].set_position(('outward', 5))
+        FigureCanvasAgg(figure).draw()
+    for side in ['left', 'right', 'bottom', 'top']:
+        assert fast.spines[side].get_position() == standard.spines[side].get_position()
+        assert numpy.allclose(fast.spines[side].get_spine_transform().get_matrix(),
+                              standard.spines[side].get_spine_transform().get_matrix())
+
+def test_ticks_follow_spine_position():
+    figure, ax = sine('fastticks')
+    canvas = FigureCanvasAgg(figure)
+    pixels(canvas)
+    ax.spines['left'].set_position(('outward', 10))
+    moved, direct = sine('fastticks')
+    direct.spines['left'].set_position(('outward', 10))
+    assert numpy.array_equal(pixels(canvas), pixels(FigureCanvasAgg(moved)))
+
+def major_labels(ax):
+    FigureCanvasAgg(ax.figure).draw()
+    return list(list(ax.xaxis.iter_tick_groups())[-1][3])
+
+TICKER_CHANGES = {
+    'locator_params': lambda ax: ax.locator_params(axis='x', nbins=3),
+    'ticklabel_format': lambda ax: ax.ticklabel_format(axis='x', style='sci', scilimits=(0, 0)),
+}
+
+@pytest.mark.parametrize('change', sorted(TICKER_CHANGES))
+def test_tick_state_follows_ticker_settings(change):
+    figure, ax = sine('fastticks')
+    before = major_labels(ax)
+    TICKER_CHANGES[change](ax)
+    after = major_labels(ax)
+    figure, fresh = sine('fastticks')
+    TICKER_CHANGES[change](fresh)
+    assert after != before
+    assert after == major_labels(fresh)
+
+def test_tick_state_stable_between_draws():
+    figure, ax = sine('fastticks')
+    ax.ticklabel_format(style='sci', scilimits=(0, 0))
+    canvas = FigureCanvasAgg(figure)
+    canvas.draw()
+    generate = ax.xaxis._generate_tick_groups
+    generated = []
+    def counting():
+        generated.append(True)
+        return generate()
+    ax.xaxis._generate_tick_groups = counting
+    canvas.draw()
+    canvas.draw()
+    assert generated == []
+
+def test_invalidate_ticks():
+    names = {5: 'five'}
+    figure, ax = sine('fastticks')
+    ax.xaxis.set_major_formatter(mticker.FuncFormatter(lambda x, pos: names.get(x, '')))
+    assert 'five' in major_labels(ax)
+    # the closure is not part of the tick state
+    names[5] = 'FIVE'
+    assert 'five' in major_labels(ax)
+    ax.xaxis.invalidate_ticks()
+    assert 'FIVE' in major_labels(ax)
+
+def test_tick_thinning():
+    figure = Figure(figsize=(4, 4), dpi=72)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.set_xlim(0, 20)
+    # 201 minor ticks 1.1 pixels apart and 41 labels 5.6 pixels apart
+    ax.xaxis.set_minor_locator(mticker.MultipleLocator(0.1))
+    ax.xaxis.set_major_locator(mticker.MultipleLocator(0.5))
+    formatted = []
+    ax.xaxis.set_major_formatter(mticker.FuncFormatter(lambda x, pos: formatted.append(x) or '%g' % x))
+    ax.xaxis.set_tick_thinning(tick_spacing=6, label_spacing=40)
+    FigureCanvasAgg(figure).draw()
+    (minor, t, p, minor_labels), (major, t, p, labels) = ax.xaxis.iter_tick_groups()
+    # every 6th minor tick and every 8th label are kept
+    assert len(minor) == 34
+    assert numpy.allclose(numpy.diff(minor), 0.6)
+    assert len(major) == 41
+    assert [l for l in labels if l] == ['0', '4', '8', '12', '16', '20']
+    assert sorted(set(formatted)) == [0, 4, 8, 12, 16, 20]
+
+class CountingLocator(mticker.MaxNLocator):
+    def __init__(self, calls):
+        mticker.MaxNLocator.__init__(self)
+        self.calls = calls
+
+    def __call__(self):
+        self.calls.append(self.axis)
+        return mticker.MaxNLocator.__call__(self)
+
+def test_shared_axes_locate_once():
+    figure = Figure(figsize=(4, 4), dpi=72)
+    top = figure.add_subplot(2, 1, 1, projection='fastticks')
+    bottom = figure.add_subplot(2, 1, 2, projection='fastticks', sharex=top)
+    calls = []
+    top.xaxis.set_major_locator(CountingLocator(calls))
+    canvas = FigureCanvasAgg(figure)
+    canvas.draw()
+    assert len(calls) == 1
+    assert major_labels(top) == major_labels(bottom)
+
+    bottom.set_xlim(0, 50)
+    canvas.draw()
+    assert len(calls) == 2
+    assert major_labels(top) == major_labels(bottom)
+    assert '50' in major_labels(top)
+
+@pytest.mark.parametrize('use_gridspec', [True, False])
+def test_colorbar_axes_are_fast(use_gridspec):
+    figure = Figure(figsize=(4, 3), dpi=72)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    image = ax.imshow(numpy.arange(12.).reshape(3, 4))
+    colorbar = figure.colorbar(image, use_gridspec=use_gridspec)
+    assert isinstance(colorbar.ax, fastaxes.FastAxes)
+    assert isinstance(colorbar.ax.yaxis, fastaxes.FastYAxis)
+    FigureCanvasAgg(figure).draw()
+
+    # an axes given by the caller is kept
+    cax = figure.add_axes([0.9, 0.1, 0.05, 0.8])
+    assert figure.colorbar(image, cax=cax).ax is cax
+
+def test_colorbar_opt_out():
+    class SlowColorbars(fastaxes.FastAxes):
+        fast_colorbars = False
+    figure = Figure()
+    ax = SlowColorbars(figure, [0.1, 0.1, 0.6, 0.8])
+    figure.add_axes(ax)
+    colorbar = figure.colorbar(ax.imshow(numpy.eye(3)), ax=ax)
+    assert not isinstance(colorbar.ax, fastaxes.FastAxes)
+
+@pytest.mark.skipif(not hasattr(Figure().add_subplot(1, 1, 1), 'inset_axes'),
+                    reason='no Axes.inset_axes')
+def test_inset_axes_are_fast():
+    figure = Figure()
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    assert isinstance(ax.inset_axes([0.5, 0.5, 0.4, 0.4]), fastaxes.FastAxes)
+
+def test_log_formatter_not_streamed():
+    # LogFormatter labels depend on the view interval
+    assert mticker.LogFormatter not in fastaxes._position_free_formatters
+    assert mticker.LogFormatterExponent not in fastaxes._position_free_formatters
+
+@pytest.mark.parametrize('linestyle', ['-', '--', ':'])
+def test_batched_gridlines_same_as_per_line(linestyle):
+    images = []
+    for batch in (True, False):
+        with matplotlib.rc_context({'grid.linestyle': linestyle}):
+            figure, ax = sine('fastticks')
+            ax.grid(True)
+            ax.xaxis.batch_gridlines = ax.yaxis.batch_gridlines = batch
+            images.append(pixels(FigureCanvasAgg(figure)))
+    assert numpy.array_equal(*images)
+
+def legend_over_frame(cache, axisbelow):
+    figure, ax = sine('fastticks')
+    ax.set_cache_decorations(cache)
+    ax.set_axisbelow(axisbelow)
+    ax.grid(True)
+    ax.lines[0].set_linewidth(4)
+    ax.fill_between(numpy.arange(20), -2, 2, color='y', alpha=0.5)
+    ax.lines[0].set_label('sine')
+    ax.legend(loc=(0.6, 0.85), framealpha=1)
+    return figure, ax
+
+@pytest.mark.parametrize('axisbelow', [True, False, 'line'])
+def test_cached_decorations_stack_like_direct(axisbelow):
+    figure, ax = legend_over_frame(True, axisbelow)
+    canvas = FigureCanvasAgg(figure)
+    cached = [pixels(canvas), pixels(canvas)]
+    assert ax._decoration_cache is not None
+    direct = pixels(FigureCanvasAgg(legend_over_frame(False, axisbelow)[0]))
+    for p in cached:
+        # alpha blending the bitmap rounds anti-aliased edges differently
+        assert numpy.abs(p.astype(int) - direct).max() <= 1
+
+DECORATION_CHANGES = {
+    'spine color': lambda ax: ax.spines['left'].set_color('r'),
+    'spine width': lambda ax: ax.spines['bottom'].set_linewidth(3),
+    'spine position': lambda ax: ax.spines['left'].set_position(('outward', 10)),
+    'label color': lambda ax: ax.xaxis.label.set_color('r'),
+    'label fontsize': lambda ax: ax.xaxis.label.set_fontsize(16),
+    'label coords': lambda ax: ax.xaxis.set_label_coords(0.3, -0.05),
+}
+
+def labeled_sine(cache):
+    figure, ax = sine('fastticks')
+    ax.set_cache_decorations(cache)
+    ax.set_xlabel('time')
+    figure.subplots_adjust(left=0.2, bottom=0.25)
+    return figure, ax
+
+@pytest.mark.parametrize('change', sorted(DECORATION_CHANGES))
+def test_cached_decorations_follow_changes(change):
+    figure, ax = labeled_sine(True)
+    canvas = FigureCanvasAgg(figure)
+    before = pixels(canvas)
+    DECORATION_CHANGES[change](ax)
+    after = pixels(canvas)
+    figure, ax = labeled_sine(False)
+    DECORATION_CHANGES[change](ax)
+    direct = pixels(FigureCanvasAgg(figure))
+    assert not numpy.array_equal(before, after)
+    assert numpy.abs(after.astype(int) - direct).max() <= 1
+
+@pytest.mark.parametrize('fmt', ['pdf', 'svg'])
+def test_rasterized_spines(fmt):
+    import io
+    figure, ax = sine('fastticks')
+    ax.set_combine_decorations(True)
+    for spine in ax.spines.values():
+        spine.set_rasterized(True)
+    out = io.BytesIO()
+    FigureCanvasAgg(figure).print_figure(out, format=fmt)
+    assert out.getvalue()
+
+def test_extent_cache():
+    figure, ax = sine('fastticks')
+    renderer = FigureCanvasAgg(figure).get_renderer()
+    cache = fastaxes.ExtentCache(maxsize=1)
+    t = ax.text(0.2, 0.3, 'label', transform=ax.transAxes)
+    assert cache.get_window_extent(t, renderer).bounds == t.get_window_extent(renderer).bounds
+    # an unchanged label moved elsewhere is a hit, translated
+    t.set_position((0.6, 0.7))
+    box = cache.get_window_extent(t, renderer)
+    assert numpy.allclose(box.bounds, t.get_window_extent(renderer).bounds)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1}
+    t.set_text('other')
+    cache.get_window_extent(t, renderer)
+    t.set_text('label')
+    cache.get_window_extent(t, renderer)
+    # the least recently used box was evicted
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'size': 1, 'maxsize': 1}
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 1}
+
+def test_extent_cache_keys_on_font_fields():
+    import matplotlib.font_manager as font_manager
+    figure, ax = sine('fastticks')
+    renderer = FigureCanvasAgg(figure).get_renderer()
+    cache = fastaxes.ExtentCache()
+    small = ax.text(0.2, 0.3, 'label', size=8)
+    large = ax.text(0.2, 0.3, 'label', size=20)
+    # make every font hash alike
+    hash_ = font_manager.FontProperties.__hash__
+    font_manager.FontProperties.__hash__ = lambda self: 0
+    try:
+        cache.get_window_extent(small, renderer)
+        cache.get_window_extent(large, renderer)
+    finally:
+        font_manager.FontProperties.__hash__ = hash_
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'size': 2, 'maxsize': 2048}
+
+def test_label_cache():
+    figure, ax = sine('fastticks')
+    formatter = ax.xaxis.get_major_formatter()
+    cache = fastaxes.LabelCache(maxsize=2)
+    locations = numpy.array([0., 5., 10., 15.])
+    labels = cache.get_labels(formatter, locations, (0, 20))
+    formatter.set_locs(locations)
+    assert labels == [formatter(v, i) for i, v in enumerate(locations)]
+    assert cache.get_labels(formatter, locations, (0, 20)) is labels
+    keep = numpy.array([True, False, True, False])
+    assert cache.get_labels(formatter, locations, (0, 20), keep) == [labels[0], '', labels[2], '']
+    # a new view interval is a new entry, evicting the oldest
+    cache.get_labels(formatter, locations, (0, 21))
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'size': 2, 'maxsize': 2}
+    cache.get_labels(formatter, locations, (0, 20))
+    assert cache.stats()['misses'] == 4
+
+def test_date_label_cache():
+    import datetime
+    import matplotlib.dates as mdates
+    days = [datetime.datetime(2016, 2, 27) + datetime.timedelta(days=i) for i in range(4)]
+    values = numpy.array(mdates.date2num(days))
+    cache = fastaxes.DateLabelCache(maxsize=6)
+    labels = cache.get_labels('%Y-%m-%d %a', values)
+    assert labels == [d.strftime('%Y-%m-%d %a') for d in days]
+    # scrolling by two days formats only the two new ones
+    assert cache.get_labels('%Y-%m-%d %a', values + 2)[:2] == labels[2:]
+    assert cache.stats() == {'hits': 2, 'misses': 6, 'size': 6, 'maxsize': 6}
+    cache.get_labels('%H:%M', values[:1])
+    assert cache.stats()['size'] == 6
+
+def test_tight_layout_cache():
+    figure = Figure(figsize=(4, 3), dpi=72, tight_layout=True)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.plot(numpy.arange(10))
+    cache = figure.tight_layout
+    assert isinstance(cache, fastaxes.TightLayoutCache)
+    canvas = FigureCanvasAgg(figure)
+    canvas.draw()
+    left = figure.subplotpars.left
+    canvas.draw()
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+    # a longer tick label moves the axes
+    ax.set_ylabel('a label')
+    canvas.draw()
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+    assert figure.subplotpars.left > left
+    cache.invalidate()
+    canvas.draw()
+    assert cache.stats() == {'hits': 1, 'misses': 3}
+
+@pytest.mark.parametrize('ylim', [(-1.5, 1.5), (0, 1e4)])
+def test_glyph_metric_tightbbox_same_as_layout(ylim):
+    figure, ax = sine('fastticks')
+    ax.set_ylim(*ylim)
+    canvas = FigureCanvasAgg(figure)
+    renderer = canvas.get_renderer()
+    axes = ax.xaxis, ax.yaxis
+    glyphs = [axis.get_tightbbox(renderer) for axis in axes]
+    # before a draw the labels are not laid out
+    assert not any(axis._label_layout for axis in axes)
+    canvas.draw()
+    layout = [axis.get_tightbbox(renderer) for axis in axes]
+    assert all(axis._label_layout for axis in axes)
+    for a, b in zip(glyphs, layout):
+        assert numpy.allclose(a.extents, b.extents)
+
+def test_tight_layout_cache_arguments():
+    figure = Figure(figsize=(4, 3), dpi=72)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.plot(numpy.arange(10))
+    renderer = FigureCanvasAgg(figure).get_renderer()
+    assert figure.tight_layout.__doc__ == Figure.tight_layout.__doc__
+    figure.tight_layout(renderer)
+    left = figure.subplotpars.left
+    figure.tight_layout(renderer)
+    # positional arguments pass through
+    figure.tight_layout(renderer, 3.0)
+    assert figure.subplotpars.left > left
+    assert figure.tight_layout.stats() == {'hits': 1, 'misses': 2}
+
+@pytest.mark.skipif(not hasattr(Figure, 'get_layout_engine'), reason='layout engines (matplotlib 3.6)')
+def test_tight_layout_engine_cached():
+    figure = Figure(figsize=(4, 3), dpi=72, tight_layout=True)
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.plot(numpy.arange(10))
+    engine_type = type(figure.get_layout_engine())
+    execute = engine_type.execute
+    calls = []
+    def counting(engine, fig):
+        calls.append(fig)
+        return execute(engine, fig)
+    engine_type.execute = counting
+    try:
+        canvas = FigureCanvasAgg(figure)
+        canvas.draw()
+        canvas.draw()
+    finally:
+        engine_type.execute = execute
+    assert len(calls) == 1
+    assert figure.tight_layout.stats() == {'hits': 1, 'misses': 1}
+
+def test_lru_cache():
+    cache = fastaxes.LRUCache(maxsize=2)
+    cache._store('a', 1)
+    cache._store('b', 2)
+    assert cache._lookup('a') == 1
+    cache._store('c', 3)
+    # b was the least recently used
+    assert cache._lookup('b') is None
+    assert cache._lookup('a') == 1 and cache._lookup('c') == 3
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 2, 'maxsize': 2}
+
+def test_format_ticks_matches_formatter():
+    figure, ax = sine('fastticks')
+    ax.set_yscale('log')
+    ax.set_ylim(1e-3, 1e4)
+    cases = [(mticker.ScalarFormatter(), ax.xaxis, [-1e5, -3., 0., 0.25, 7., 1e6]),
+             (mticker.ScalarFormatter(), ax.xaxis, [1000.5, 1001., 1001.5]),
+             (mticker.LogFormatterMathtext(), ax.yaxis, [1e-3, 0.5, 1., 10., 2000.]),
+             (mticker.LogFormatterMathtext(labelOnlyBase=False), ax.yaxis, [1e-3, 0.5, 1., 10., 2000.]),
+             (mticker.FixedFormatter(['a', 'b']), ax.xaxis, [0., 1., 2.]),
+             (mticker.NullFormatter(), ax.xaxis, [0., 1.])]
+    batched = set([mticker.FixedFormatter, mticker.NullFormatter])
+    if fastaxes._mpl_version < (3, 1):
+        batched.add(mticker.ScalarFormatter)
+    assert batched == set(fastaxes._batch_formatters) & set(type(f) for f, axis, values in cases)
+    for formatter, axis, values in cases:
+        formatter.set_axis(axis)
+        values = numpy.array(values)
+        indices = numpy.arange(len(values))
+        formatter.set_locs(values)
+        expected = [formatter(v, i) for i, v in enumerate(values)]
+        assert fastaxes.format_ticks(formatter, values, indices) == expected
+        if type(formatter) in batched:
+            # not the per value fallback
+            assert fastaxes._batch_formatters[type(formatter)](formatter, values, indices) == expected
+
+def test_axis_stats_add():
+    stats, other = fastaxes.AxisStats(), fastaxes.AxisStats()
+    other.times['ticks'] = 0.5
+    other.counts['draws'] = 2
+    stats.add(other)
+    stats.add(other)
+    assert stats.as_dict()['times']['ticks'] == 1.
+    assert stats.as_dict()['counts'] == dict(dict.fromkeys(fastaxes.AxisStats.COUNTERS, 0), draws=4)
+
+def test_figure_stats():
+    figure, ax = sine('fastticks')
+    canvas = FigureCanvasAgg(figure)
+    frames = []
+    stats = fastaxes.enable_stats(figure, lambda axis, frame: frames.append((axis, frame)))
+    assert fastaxes.figure_stats(figure) is stats
+
+    canvas.draw()
+    ax.xaxis.get_tightbbox(canvas.get_renderer())
+    canvas.draw()
+    assert [axis for axis, frame in frames] == [ax.xaxis, ax.yaxis] * 2
+    last = stats.last(ax.xaxis)
+    assert last is frames[2][1]
+    ticks = sum(len(locations) for locations, tickbars, props, labels in ax.xaxis.iter_tick_groups())
+    assert last.counts['draws'] == 1 and last.counts['tightbbox'] == 1
+    assert last.counts['ticks'] == ticks and last.counts['labels'] > 0
+    assert last.times['ticks'] > 0 and last.times['tightbbox'] > 0
+    # the tick groups were built in the first frame only
+    assert stats.total(ax.xaxis).times['locator'] == frames[0][1].times['locator'] > 0
+    assert last.times['locator'] == 0
+    assert stats.total().counts['draws'] == 4
+    assert stats.last().counts['ticks'] == last.counts['ticks'] + stats.last(ax.yaxis).counts['ticks']
+
+    fastaxes.disable_stats(figure)
+    canvas.draw()
+    assert fastaxes.figure_stats(figure) is None and len(frames) == 4
+
+def test_props_registry():
+    figure = Figure()
+    axes = [figure.add_subplot(2, 1, i, projection='fastticks') for i in (1, 2)]
+    registry = fastaxes.props_registry(figure)
+    assert fastaxes.props_registry(figure) is registry
+    first, second = [registry.get_props(ax.xaxis, True) for ax in axes]
+    assert first is second
+    assert registry.get_props(axes[0].yaxis, True) is not first
+    assert registry.get_props(axes[0].xaxis, False) is not first
+    with matplotlib.rc_context({'xtick.major.size': 9}):
+        assert registry.get_props(axes[0].xaxis, True) is not first
+    assert registry.font(10) is registry.font(10)
+
+    FigureCanvasAgg(figure).draw()
+    assert first.texts
+    other = Figure()
+    fastaxes.use_props_registry(other, registry)
+    assert fastaxes.props_registry(other) is registry
+    assert first.texts == [] and first.texts2 == []
+
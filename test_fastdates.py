@@ -0,0 +1,81 @@
+import datetime
+import numpy
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+import fastdates
+
+def locators():
+    'Date locators with the longest span (in days) to locate ticks over'
+    return [(mdates.AutoDateLocator(), None),
+            (mdates.AutoDateLocator(interval_multiples=True), None),
+            (mdates.AutoDateLocator(interval_multiples=False), None),
+            (mdates.MonthLocator(), None),
+            (mdates.MonthLocator(bymonthday=15, interval=2), None),
+            (mdates.DayLocator(interval=3), 1000),
+            (mdates.HourLocator(byhour=range(0, 24, 6)), 100),
+            (mdates.MinuteLocator(interval=15), 5),
+            (mdates.SecondLocator(bysecond=[0, 30]), 0.1)]
+
+def check_located(locator, vmin, vmax):
+    locator.create_dummy_axis()
+    locator.axis.set_view_interval(vmin, vmax)
+    locator.axis.set_data_interval(vmin, vmax)
+    try:
+        expected = locator()
+    except RuntimeError:
+        # too many ticks
+        with pytest.raises(RuntimeError):
+            fastdates.locate_ticks(locator)
+        return
+    assert numpy.array_equal(fastdates.locate_ticks(locator), expected), (locator, vmin, vmax)
+
+def test_locate_ticks_matches_locator():
+    random = numpy.random.RandomState(0)
+    origin = mdates.date2num(datetime.datetime(2016, 1, 1))
+    # spans from seconds to decades, in days
+    for span in 10 ** random.uniform(-4, 4, 40):
+        vmin = origin + random.uniform(-3000, 3000)
+        for locator, longest in locators():
+            if longest is None or span <= longest:
+                check_located(locator, vmin, vmin + span)
+
+def test_rrule_between_matches_dateutil():
+    start = datetime.datetime(2015, 11, 30, 7, 15, 20)
+    after = datetime.datetime(2016, 1, 1)
+    before = datetime.datetime(2016, 4, 1)
+    rules = [mdates.rrulewrapper(mdates.MONTHLY, dtstart=start, bymonthday=31),
+             mdates.rrulewrapper(mdates.DAILY, dtstart=start, interval=5),
+             mdates.rrulewrapper(mdates.HOURLY, dtstart=start, byhour=(0, 12), byminute=0, bysecond=0),
+             mdates.rrulewrapper(mdates.YEARLY, dtstart=start, bymonth=(1, 3), bymonthday=1)]
+    for wrapper in rules:
+        rule = wrapper._rrule
+        vector = fastdates.rrule_between(rule, after, before)
+        assert vector is not None
+        assert vector.astype(datetime.datetime).tolist() == rule.between(after, before, True)
+    weekly = mdates.rrulewrapper(mdates.WEEKLY, dtstart=start)
+    assert fastdates.rrule_between(weekly._rrule, after, before) is None
+
+def test_strftime64_matches_strftime():
+    days = [datetime.datetime(2016, 2, 27, 13, 5, 9, 250) + datetime.timedelta(days=i, hours=7 * i) for i in range(5)]
+    dt = numpy.array(days, dtype='M8[us]')
+    for fmt in ['%Y-%m-%d', '%H:%M:%S.%f', '%a %d %b %Y', '%I %p', '%j %y %% %B %A', 'day %d%']:
+        try:
+            expected = [d.strftime(fmt) for d in days]
+        except ValueError:
+            with pytest.raises(ValueError):
+                fastdates.strftime64(fmt, dt)
+            continue
+        assert fastdates.strftime64(fmt, dt) == expected
+    # directives which are not implemented
+    assert fastdates.strftime64('%U', dt) is None
+
+def test_num2datetime64_matches_num2date():
+    values = mdates.date2num(datetime.datetime(2016, 2, 27)) + numpy.array([0., 0.25, 1e-6, 1 / 3., 400.5])
+    dt = fastdates.num2datetime64(values)
+    if dt is None:
+        # the rounding of this matplotlib is not replicated
+        return
+    expected = [d.replace(tzinfo=None) for d in mdates.num2date(values)]
+    assert dt.astype(datetime.datetime).tolist() == expected
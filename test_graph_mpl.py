@@ -1,51 +1,38 @@
-import time
+from __future__ import print_function
+import sys
+import json
+import timeit
+import argparse
+import collections
 import numpy
-from PySide import QtCore, QtGui
 import matplotlib
+matplotlib.use('Agg')
 import matplotlib.ticker
-matplotlib.use('Qt4Agg')
-from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from matplotlib.figure import Figure
 import fastaxes as f
+import threadedagg
 
-class Graph(QtGui.QWidget):
-    def __init__(self, parent=None):
-        super(Graph, self).__init__(parent)
+# Headless replacement for the old PySide "Test FPS" widget.  The same
+# figure (a scatter of Points points with Ticks linear minor ticks) is
+# redrawn on Agg while an interaction trace mutates it between frames.
 
-        self.figure = Figure(figsize=(600, 600), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))#, tight_layout=True)
-        self.canvas = FigureCanvas(self.figure)
-        self.ax = self.figure.add_subplot(1, 1, 1, projection='fastticks')
-
-        self.layout = QtGui.QVBoxLayout(self)
-
-        self.header = QtGui.QHBoxLayout()
-
-        self.form = QtGui.QFormLayout()
-        self.num_points_edit = QtGui.QLineEdit()
-        self.num_points_edit.setText('100')
-        self.num_points_edit.editingFinished.connect(self.present_axis)
-        self.num_ticks_edit = QtGui.QLineEdit()
-        self.num_ticks_edit.setText('10')
-        self.num_ticks_edit.editingFinished.connect(self.present_axis)
-        self.form.addRow('Points', self.num_points_edit)
-        self.form.addRow('Ticks', self.num_ticks_edit)
+SIZE = 600
+DPI = 72
 
-        self.header.addLayout(self.form)
-        self.commands = QtGui.QDialogButtonBox(QtCore.Qt.Vertical)
-        self.commands.addButton('Test FPS', QtGui.QDialogButtonBox.ActionRole).clicked.connect(self.test_fps)
-        self.header.addWidget(self.commands)
-
-        self.layout.addLayout(self.header)
-        self.layout.addWidget(self.canvas)
+class Graph(object):
+    def __init__(self, points, ticks, proj=None):
+        self.points = points
+        self.ticks = ticks
+        self.figure = Figure(figsize=(SIZE / float(DPI), SIZE / float(DPI)), dpi=DPI, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot(1, 1, 1, projection=proj)
+        self.present_axis()
 
     def present_axis(self):
-        self.points = int(self.num_points_edit.text())
-        self.ticks = int(self.num_ticks_edit.text())
-
-        if hasattr(self, 'scat'):
-            self.scat.remove()
-
-        self.scat = self.ax.scatter(numpy.arange(self.points), numpy.sin(numpy.arange(self.points)))
+        x = numpy.arange(self.points)
+        self.offsets = numpy.column_stack((x, numpy.sin(x)))
+        self.scat = self.ax.scatter(self.offsets[:, 0], self.offsets[:, 1])
         self.ax.xaxis.set_minor_locator(matplotlib.ticker.LinearLocator(self.ticks))
         self.ax.yaxis.set_minor_locator(matplotlib.ticker.LinearLocator(self.ticks))
         if self.ticks == 0:
@@ -55,22 +42,179 @@ class Graph(QtGui.QWidget):
             self.ax.yaxis.set_major_locator(matplotlib.ticker.NullLocator())
         self.canvas.draw()
 
-    def test_fps(self):
-        self.start_test = time.time()
-        self.test_count = 0
-        QtCore.QTimer.singleShot(0, self._internal_test)
+# Each trace is a generator function taking the Graph and the number of frames.
+# It mutates the figure before each frame and yields once per frame.
 
-    def _internal_test(self):
-        now = time.time()
-        if now - self.start_test > 1.:
-            print 'Points:  {}; Ticks:  {};  FPS:  {}'.format(self.points, self.ticks, self.test_count)
-            return
-        self.canvas.draw()
-        self.test_count += 1
-        QtCore.QTimer.singleShot(0, self._internal_test)
-
-app = QtGui.QApplication([])
-w = QtGui.QMainWindow()
-w.setCentralWidget(Graph())
-w.show()
-app.exec_()
+def pan(graph, frames):
+    low, high = graph.ax.get_xlim()
+    step = (high - low) / 100.
+    for i in range(frames):
+        graph.ax.set_xlim(low + i * step, high + i * step)
+        yield
+
+def zoom(graph, frames):
+    (xlow, xhigh), (ylow, yhigh) = graph.ax.get_xlim(), graph.ax.get_ylim()
+    xmid, ymid = (xlow + xhigh) / 2., (ylow + yhigh) / 2.
+    for i in range(frames):
+        # zoom in and back out
+        scale = 0.98 ** (i if i < frames // 2 else frames - i)
+        graph.ax.set_xlim(xmid - (xmid - xlow) * scale, xmid + (xhigh - xmid) * scale)
+        graph.ax.set_ylim(ymid - (ymid - ylow) * scale, ymid + (yhigh - ymid) * scale)
+        yield
+
+def autoscale(graph, frames):
+    for i in range(frames):
+        offsets = graph.offsets * [1., 1. + i / 10.]
+        graph.scat.set_offsets(offsets)
+        graph.ax.ignore_existing_data_limits = True
+        graph.ax.update_datalim(offsets)
+        graph.ax.autoscale_view()
+        yield
+
+def append(graph, frames):
+    # data only; the view stays where it is
+    offsets = graph.offsets
+    for i in range(frames):
+        n = len(offsets)
+        offsets = numpy.vstack((offsets, [[n % graph.points, numpy.sin(n)]]))
+        graph.scat.set_offsets(offsets)
+        yield
+
+def resize(graph, frames):
+    sizes = [SIZE, SIZE * 0.9, SIZE * 0.8, SIZE * 0.9]
+    for i in range(frames):
+        side = sizes[i % len(sizes)] / float(DPI)
+        graph.figure.set_size_inches(side, side)
+        yield
+
+TRACES = collections.OrderedDict((trace.__name__, trace) for trace in [pan, zoom, autoscale, append, resize])
+
+def replay(trace, points, ticks, proj, frames):
+    '''
+    Replay a trace on a fresh Graph and return the per frame draw latencies in
+    seconds.  Only canvas.draw() is timed, as in the widget.
+    '''
+    graph = Graph(points, ticks, proj=proj)
+    latencies = []
+    for _ in trace(graph, frames):
+        start = timeit.default_timer()
+        graph.canvas.draw()
+        latencies.append(timeit.default_timer() - start)
+    return latencies
+
+def replay_threaded(trace, points, ticks, proj, frames, rate):
+    '''
+    Replay a trace through a threadedagg.BackgroundRenderer, with input events
+    arriving rate times per second on this thread (the GUI thread of a
+    ManualEventLoop).  Return the input latencies (request and event
+    processing), the ages of the delivered frames (from their request to
+    delivery) in seconds and the BackgroundRenderer.
+    '''
+    graph = Graph(points, ticks, proj=proj)
+    steps = trace(graph, frames)
+    applied = [0]
+
+    def apply(figure, index):
+        # catch up with the latest requested step of the trace
+        while applied[0] < index:
+            next(steps)
+            applied[0] += 1
+
+    loop = threadedagg.ManualEventLoop()
+    requested = {}
+    ages = []
+    def deliver(frame):
+        ages.append(timeit.default_timer() - requested[frame.serial])
+
+    background = threadedagg.BackgroundRenderer(graph.figure, apply, post=loop.post, deliver=deliver)
+    background.start()
+    latencies = []
+    start = timeit.default_timer()
+    try:
+        for index in range(1, frames + 1):
+            now = timeit.default_timer()
+            serial = background.request(index)
+            requested[serial] = now
+            loop.process_events()
+            latencies.append(timeit.default_timer() - now)
+            # sleep until the next input event, handling deliveries meanwhile
+            while timeit.default_timer() < start + index / float(rate):
+                loop.process_events(timeout=start + index / float(rate) - timeit.default_timer())
+        background.wait_idle()
+        loop.process_events()
+    finally:
+        background.stop()
+    return latencies, ages, background
+
+def summarize(latencies):
+    latencies = numpy.asarray(latencies)
+    return {'p50_ms': float(numpy.percentile(latencies, 50) * 1e3),
+            'p95_ms': float(numpy.percentile(latencies, 95) * 1e3),
+            'p99_ms': float(numpy.percentile(latencies, 99) * 1e3),
+            'fps': float(len(latencies) / latencies.sum()),
+            'frames': len(latencies)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless interactive redraw benchmark on Agg')
+    parser.add_argument('--points', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--ticks', type=int, nargs='+', default=[0, 10, 100])
+    parser.add_argument('--traces', nargs='+', default=list(TRACES), choices=list(TRACES))
+    parser.add_argument('--frames', type=int, default=60, help='frames per trace')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--threaded', action='store_true',
+                        help='render on a background thread (threadedagg) and report input latency and frame age')
+    parser.add_argument('--rate', type=float, default=120., help='input events per second with --threaded')
+    args = parser.parse_args(argv)
+
+    if args.threaded:
+        return main_threaded(args)
+
+    print('{:<10s} {:>6s} {:>5s}  {:>25s}  {:>25s}'.format('trace', 'points', 'ticks', 'std p50/p95/p99 ms (FPS)', 'fast p50/p95/p99 ms (FPS)'))
+    results = []
+    for trace in args.traces:
+        for points in args.points:
+            for ticks in args.ticks:
+                row = {'trace': trace, 'points': points, 'ticks': ticks}
+                for column, proj in (('std', None), ('fast', 'fastticks')):
+                    row[column] = summarize(replay(TRACES[trace], points, ticks, proj, args.frames))
+                results.append(row)
+                print('{:<10s} {:>6d} {:>5d}  {:>5.1f}/{:>5.1f}/{:>5.1f} ({:>6.1f})  {:>5.1f}/{:>5.1f}/{:>5.1f} ({:>6.1f})'.format(
+                        trace, points, ticks,
+                        row['std']['p50_ms'], row['std']['p95_ms'], row['std']['p99_ms'], row['std']['fps'],
+                        row['fast']['p50_ms'], row['fast']['p95_ms'], row['fast']['p99_ms'], row['fast']['fps']))
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'matplotlib': matplotlib.__version__,
+                       'frames': args.frames,
+                       'results': results}, fp, indent=2)
+    return 0
+
+def main_threaded(args):
+    print('{:<10s} {:>6s} {:>5s}  {:>26s}  {:>26s}'.format('trace', 'points', 'ticks', 'std input p99/age p50 (drawn)', 'fast input p99/age p50 (drawn)'))
+    results = []
+    for trace in args.traces:
+        for points in args.points:
+            for ticks in args.ticks:
+                row = {'trace': trace, 'points': points, 'ticks': ticks}
+                for column, proj in (('std', None), ('fast', 'fastticks')):
+                    latencies, ages, background = replay_threaded(TRACES[trace], points, ticks, proj, args.frames, args.rate)
+                    row[column] = {'input': summarize(latencies), 'age': summarize(ages)}
+                    row[column].update(background.stats())
+                results.append(row)
+                print('{:<10s} {:>6d} {:>5d}  {:>7.2f}/{:>7.1f} ms ({:>4d})  {:>7.2f}/{:>7.1f} ms ({:>4d})'.format(
+                        trace, points, ticks,
+                        row['std']['input']['p99_ms'], row['std']['age']['p50_ms'], row['std']['frames'],
+                        row['fast']['input']['p99_ms'], row['fast']['age']['p50_ms'], row['fast']['frames']))
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'matplotlib': matplotlib.__version__,
+                       'frames': args.frames,
+                       'rate': args.rate,
+                       'threaded': True,
+                       'results': results}, fp, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import io
+import numpy
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import fastaxes
+import pdfmarkers
+
+def marker_xobjects(share):
+    figure = Figure(figsize=(4, 4))
+    for i in range(4):
+        ax = figure.add_subplot(2, 2, i + 1, projection='fastticks')
+        ax.plot(numpy.arange(10))
+        # enough ticks per group for draw_markers to use an XObject
+        ax.minorticks_on()
+        ax.xaxis.share_pdf_markers = ax.yaxis.share_pdf_markers = share
+    out = io.BytesIO()
+    FigureCanvasAgg(figure).print_figure(out, format='pdf')
+    # the only form XObjects of the file are the markers
+    return out.getvalue().count(b'/BBox')
+
+def test_subplots_share_markers():
+    shared = marker_xobjects(True)
+    assert shared > 0
+    assert marker_xobjects(False) == 4 * shared
+
+def test_index_installed_once():
+    class File(object):
+        markers = {}
+        def markerObject(self, *args):
+            return 'M0'
+    pdf_file = File()
+    index = pdfmarkers.index_pdf_markers(pdf_file)
+    assert isinstance(index, pdfmarkers.PdfMarkerIndex)
+    assert pdfmarkers.index_pdf_markers(pdf_file) is index
+    assert index.stats() == {'hits': 0, 'misses': 0, 'size': 0}
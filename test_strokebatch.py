@@ -0,0 +1,52 @@
+import numpy
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.path as mpath
+import matplotlib.transforms as mtransforms
+from matplotlib.backends.backend_agg import RendererAgg
+import strokebatch
+
+def draw_lines(renderer):
+    # strokes which do not touch, of two colors, around a filled square
+    square = mpath.Path([[60, 60], [80, 60], [80, 80], [60, 80], [60, 60]])
+    for color, ys in [((0, 0, 0), [10.5, 20.5, 30.5]), ((1, 0, 0), [40.5]),
+                      (None, None), ((0, 0, 0), [50.5])]:
+        gc = renderer.new_gc()
+        if color is None:
+            renderer.draw_path(gc, square, mtransforms.IdentityTransform(), (0, 0, 1))
+        else:
+            gc.set_foreground(color)
+            gc.set_linewidth(1.)
+            for y in ys:
+                path = mpath.Path([[10, y], [90, y]])
+                renderer.draw_path(gc, path, mtransforms.Affine2D().translate(0, 1))
+        gc.restore()
+
+def pixels(renderer):
+    buf = numpy.frombuffer(renderer.buffer_rgba(), numpy.uint8)
+    return buf.reshape(int(renderer.height), int(renderer.width), 4).copy()
+
+def test_merges_strokes_of_one_style():
+    direct = RendererAgg(100, 100, 72)
+    draw_lines(direct)
+
+    renderer = RendererAgg(100, 100, 72)
+    batch = strokebatch.StrokeBatch(renderer)
+    batch.install()
+    draw_lines(renderer)
+    assert not pixels(renderer)[..., 3].any()
+    batch.flush()
+    # the black strokes after the fill are merged with those before it
+    assert (batch.calls, batch.made) == (6, 3)
+    assert 'draw_path' not in vars(renderer)
+    assert numpy.array_equal(pixels(renderer), pixels(direct))
+
+def test_spine_style():
+    from matplotlib.figure import Figure
+    ax = Figure().add_subplot(1, 1, 1)
+    left, right = ax.spines['left'], ax.spines['right']
+    assert strokebatch.spine_style(left) == strokebatch.spine_style(right)
+    right.set_color('r')
+    assert strokebatch.spine_style(left) != strokebatch.spine_style(right)
+    right.set_rasterized(True)
+    assert strokebatch.spine_style(right) is None
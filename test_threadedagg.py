@@ -0,0 +1,73 @@
+import threading
+import numpy
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import fastaxes
+import threadedagg
+
+def sine(xlim=None):
+    figure = Figure(figsize=(3, 2), dpi=72, facecolor=(1, 1, 1))
+    ax = figure.add_subplot(1, 1, 1, projection='fastticks')
+    ax.plot(numpy.arange(50), numpy.sin(numpy.arange(50) / 5.))
+    if xlim is not None:
+        ax.set_xlim(*xlim)
+    return figure
+
+def synchronous(figure):
+    canvas = FigureCanvasAgg(figure)
+    canvas.draw()
+    renderer = canvas.get_renderer()
+    buf = numpy.frombuffer(canvas.buffer_rgba(), numpy.uint8)
+    return buf.reshape(int(renderer.height), int(renderer.width), 4)
+
+def test_requests_coalesce():
+    started = threading.Event()
+    release = threading.Event()
+    applied = []
+
+    def apply(figure, xlim):
+        applied.append(xlim)
+        if len(applied) == 1:
+            # hold the worker in the first frame while more requests arrive
+            started.set()
+            release.wait(10)
+        figure.axes[0].set_xlim(*xlim)
+
+    loop = threadedagg.ManualEventLoop()
+    frames = []
+    background = threadedagg.BackgroundRenderer(sine(), apply, post=loop.post, deliver=frames.append)
+    background.start()
+    try:
+        background.request((0, 10))
+        assert started.wait(10)
+        for start in range(1, 5):
+            serial = background.request((start, start + 10))
+        release.set()
+        assert background.wait_idle(10)
+        loop.process_events()
+    finally:
+        background.stop(10)
+
+    # the four requests made during the first frame were drawn once
+    assert applied == [(0, 10), (4, 14)]
+    assert background.stats() == {'requests': 5, 'frames': 2, 'coalesced': 3, 'dropped': 1}
+    # and the first frame was superseded before the event loop ran
+    assert [(f.serial, f.state, f.error) for f in frames] == [(serial, (4, 14), None)]
+    assert numpy.array_equal(frames[0].image, synchronous(sine((4, 14))))
+
+def test_errors_are_delivered():
+    def apply(figure, state):
+        raise ValueError('bad state')
+
+    frames = []
+    background = threadedagg.BackgroundRenderer(sine(), apply, deliver=frames.append)
+    background.start()
+    try:
+        background.request('state')
+        assert background.wait_idle(10)
+    finally:
+        background.stop(10)
+    assert len(frames) == 1 and frames[0].image is None
+    assert 'bad state' in frames[0].error
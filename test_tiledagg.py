@@ -0,0 +1,87 @@
+import numpy
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import fastaxes
+import tiledagg
+
+needs_fork = pytest.mark.skipif(tiledagg._fork_context() is None, reason='needs fork')
+
+# the tests check the output rather than the speed, so tile on machines with
+# fewer cores than workers too
+tiledagg._cpu_count = lambda: 8
+
+def grid(proj='fastticks', tight_layout=False):
+    figure = Figure(figsize=(6, 6), dpi=72, facecolor=(1, 1, 1), tight_layout=tight_layout)
+    for i in range(16):
+        ax = figure.add_subplot(4, 4, i + 1, projection=proj)
+        ax.plot(numpy.arange(20), numpy.sin(numpy.arange(20) + i))
+        ax.set_title('axes %d' % i, fontsize=8)
+    return figure
+
+def pixels(canvas):
+    canvas.draw()
+    renderer = canvas.get_renderer()
+    buf = numpy.frombuffer(canvas.buffer_rgba(), numpy.uint8)
+    return buf.reshape(int(renderer.height), int(renderer.width), 4).copy()
+
+@needs_fork
+@pytest.mark.parametrize('proj, tight_layout', [(None, False), ('fastticks', False),
+                                                (None, True), ('fastticks', True)])
+def test_identical_to_agg(proj, tight_layout):
+    serial = pixels(FigureCanvasAgg(grid(proj, tight_layout)))
+    tiled = pixels(tiledagg.FigureCanvasTiledAgg(grid(proj, tight_layout), workers=3))
+    assert numpy.array_equal(serial, tiled)
+
+def test_serial_with_one_core():
+    class NoFork(object):
+        def Pool(self, processes):
+            raise AssertionError('forked')
+    figure = grid()
+    serial = pixels(FigureCanvasAgg(figure))
+    canvas = tiledagg.FigureCanvasTiledAgg(figure, workers=4)
+    fork_context, cpu_count = tiledagg._fork_context, tiledagg._cpu_count
+    tiledagg._fork_context, tiledagg._cpu_count = NoFork, lambda: 1
+    try:
+        assert numpy.array_equal(pixels(canvas), serial)
+    finally:
+        tiledagg._fork_context, tiledagg._cpu_count = fork_context, cpu_count
+
+@needs_fork
+def test_redraw_identical():
+    canvas = tiledagg.FigureCanvasTiledAgg(grid(), workers=4)
+    first = pixels(canvas)
+    canvas.figure.axes[5].set_xlim(3, 9)
+    second = pixels(canvas)
+
+    figure = grid()
+    figure.axes[5].set_xlim(3, 9)
+    assert not numpy.array_equal(first, second)
+    assert numpy.array_equal(second, pixels(FigureCanvasAgg(figure)))
+
+@needs_fork
+def test_one_draw_event(tmpdir):
+    # the workers draw in other processes, so count the events in a file
+    log = tmpdir.join('events')
+    log.write('')
+    canvas = tiledagg.FigureCanvasTiledAgg(grid(), workers=4)
+    canvas.mpl_connect('draw_event', lambda event: log.write('draw\n', mode='a'))
+    canvas.draw()
+    assert log.read().splitlines() == ['draw']
+
+def test_worker_draws_several_bands():
+    # a pool worker can be handed more than one band of the same draw
+    figure = grid()
+    serial = pixels(FigureCanvasAgg(figure))
+    canvas = tiledagg.FigureCanvasTiledAgg(figure, workers=3)
+    bands = canvas._bands(canvas.get_renderer(), 3)
+    tiledagg._figure, tiledagg._bands = figure, bands
+    try:
+        for index in reversed(range(len(bands))):
+            row0, row1, axes = bands[index]
+            band = numpy.frombuffer(tiledagg._render_band(index), numpy.uint8)
+            assert numpy.array_equal(band.reshape(row1 - row0, -1, 4), serial[row0:row1])
+    finally:
+        tiledagg._figure, tiledagg._bands = None, None
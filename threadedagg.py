@@ -0,0 +1,215 @@
+"""
+Background rendering on Agg with redraw coalescing for GUI canvases.
+
+Drawing in the paint handler of a GUI canvas blocks the UI thread, so a burst
+of pan events queues up one full render per event.  A BackgroundRenderer owns
+the figure once started:  every change to it is made on its worker thread by
+apply(figure, state), and the GUI only asks for a state to be shown.
+
+    def apply(figure, xlim):
+        figure.axes[0].set_xlim(*xlim)
+
+    def show(frame):
+        # on the GUI thread; frame.image is a height x width x 4 RGBA array
+        ...
+
+    background = BackgroundRenderer(figure, apply, post=post, deliver=show)
+    background.start()
+
+    def on_pan(event):
+        background.request(new_xlim)
+
+A request made while another one is waiting replaces it, so however long a
+frame takes the worker only ever draws the latest state.  Finished frames are
+handed back through post(callable), which must run the callable on the GUI
+thread; with Qt that is a signal emitted from the worker and connected to a
+slot calling it.  If the GUI falls behind, only the newest frame is delivered.
+ManualEventLoop is a stand-in for the GUI event loop for headless use and
+tests.
+
+Figure.draw still processes the draw_event callbacks of figure.canvas, on the
+worker thread.
+"""
+import threading
+import traceback
+import timeit
+import collections
+import numpy
+from matplotlib.backends.backend_agg import FigureCanvasAgg, RendererAgg
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# image is None and error the formatted traceback when apply or draw raised
+Frame = collections.namedtuple('Frame', 'image state serial seconds error')
+
+class BackgroundRenderer(object):
+    def __init__(self, figure, apply=None, post=None, deliver=None):
+        '''
+        apply(figure, state) brings the figure to a requested state on the
+        worker thread.  deliver(frame) receives each finished Frame through
+        post(callable); without post it is called on the worker thread.
+        '''
+        self.figure = figure
+        self.apply = apply
+        self.post = post
+        self.deliver = deliver
+        if getattr(figure, 'canvas', None) is None:
+            FigureCanvasAgg(figure)
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._busy = False
+        self._serial = 0
+        # (serial, state) of the latest request not drawn yet
+        self._pending = None
+        # the latest frame not delivered yet
+        self._ready = None
+        self._delivery_posted = False
+        self._renderer = None
+
+        self.requests = 0
+        self.frames = 0
+        # requests replaced by a later one before being drawn
+        self.coalesced = 0
+        # frames replaced by a later one before being delivered
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='BackgroundRenderer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        'Stop the worker after the frame in progress; pending requests are discarded'
+        with self._condition:
+            self._stopping = True
+            self._pending = None
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request(self, state=None):
+        '''
+        Ask for the figure to be drawn in state, replacing any request which
+        is still waiting.  Returns the serial number of the request, which the
+        delivered Frame carries.
+        '''
+        with self._condition:
+            self._serial += 1
+            self.requests += 1
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (self._serial, state)
+            self._condition.notify_all()
+            return self._serial
+
+    def wait_idle(self, timeout=None):
+        '''
+        Wait until every request has been drawn and its frame posted, and
+        return True, or False on timeout.
+        '''
+        with self._condition:
+            end = None if timeout is None else timeit.default_timer() + timeout
+            while self._pending is not None or self._busy:
+                remaining = None if end is None else end - timeit.default_timer()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stats(self):
+        with self._condition:
+            return {'requests': self.requests, 'frames': self.frames,
+                    'coalesced': self.coalesced, 'dropped': self.dropped}
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                (serial, state), self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._hand_over(self._render(serial, state))
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _render(self, serial, state):
+        start = timeit.default_timer()
+        try:
+            if self.apply is not None:
+                self.apply(self.figure, state)
+            figure = self.figure
+            width, height = int(figure.bbox.width), int(figure.bbox.height)
+            renderer = self._renderer
+            if renderer is None or (renderer.width, renderer.height, renderer.dpi) != (width, height, figure.dpi):
+                renderer = self._renderer = RendererAgg(width, height, figure.dpi)
+            else:
+                renderer.clear()
+            figure.draw(renderer)
+            buf = numpy.frombuffer(renderer.buffer_rgba(), numpy.uint8).reshape(height, width, 4)
+            # the renderer is drawn into again by the next frame
+            image, error = buf.copy(), None
+        except Exception:
+            image, error = None, traceback.format_exc()
+        with self._condition:
+            self.frames += 1
+        return Frame(image, state, serial, timeit.default_timer() - start, error)
+
+    def _hand_over(self, frame):
+        with self._condition:
+            if self._ready is not None:
+                self.dropped += 1
+            self._ready = frame
+            post = not self._delivery_posted
+            self._delivery_posted = True
+        if not post:
+            return
+        if self.post is None:
+            self._deliver()
+        else:
+            self.post(self._deliver)
+
+    def _deliver(self):
+        with self._condition:
+            frame, self._ready = self._ready, None
+            self._delivery_posted = False
+        if frame is not None and self.deliver is not None:
+            self.deliver(frame)
+
+class ManualEventLoop(object):
+    '''
+    A GUI event loop stand-in:  post() may be called from any thread, and the
+    posted callables run on the thread calling process_events().
+    '''
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def post(self, fn):
+        self._queue.put(fn)
+
+    def process_events(self, timeout=0):
+        '''
+        Run the posted callables, waiting up to timeout seconds for the first
+        one.  Return the number run.
+        '''
+        count = 0
+        block = timeout > 0
+        while True:
+            try:
+                fn = self._queue.get(block, timeout if block else None)
+            except queue.Empty:
+                return count
+            block = False
+            fn()
+            count += 1
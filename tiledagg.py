@@ -0,0 +1,167 @@
+"""
+Parallel tile rendering on Agg for figures with many axes.
+
+FigureCanvasTiledAgg splits the canvas into horizontal bands, one per forked
+worker process, which draws the figure with only the axes that can paint into
+its band visible.  The output is pixel-identical to FigureCanvasAgg, except for
+artists drawn with clip_on=False beyond the tight bbox of their axes.
+"""
+import os
+import multiprocessing
+import numpy
+from matplotlib import rcParams
+from matplotlib.backend_bases import DrawEvent
+import matplotlib.font_manager as font_manager
+from matplotlib.backends.backend_agg import FigureCanvasAgg, RendererAgg
+import matplotlib.transforms as mtransforms
+
+# state of the draw in progress, inherited by the forked workers
+_figure = None
+_bands = None
+
+# the Figure methods Figure.draw asks whether to lay out the axes, across
+# matplotlib versions, and the answers that make it draw them where they are
+_no_layout = {'get_tight_layout': False, 'get_constrained_layout': False, 'get_layout_engine': None}
+
+def _lay_out(figure, renderer):
+    'Lay out the axes as Figure.draw would before drawing them'
+    if not figure.axes:
+        return
+    if hasattr(figure, 'get_layout_engine'):
+        engine = figure.get_layout_engine()
+        if engine is not None:
+            engine.execute(figure)
+        return
+    if getattr(figure, 'get_constrained_layout', lambda: False)():
+        figure.execute_constrained_layout(renderer)
+    if figure.get_tight_layout():
+        try:
+            figure.tight_layout(renderer, **figure._tight_parameters)
+        except ValueError:
+            pass
+
+def _forget_fonts():
+    '''
+    Drop the FreeType fonts inherited from the parent, which share their file
+    positions with those of the other workers (matplotlib 3 does this itself
+    after a fork).
+    '''
+    fontd = getattr(RendererAgg, '_fontd', None)
+    if fontd is not None:
+        fontd.clear()
+    get_font = getattr(font_manager, 'get_font', None)
+    if hasattr(get_font, 'cache_clear'):
+        get_font.cache_clear()
+
+def _render_band(index):
+    figure, (row0, row1, axes) = _figure, _bands[index]
+    width, height = int(figure.bbox.width), int(figure.bbox.height)
+    renderer = RendererAgg(width, height, figure.dpi)
+    # the parent fires draw_event once the bands are in place
+    figure.canvas.callbacks.callbacks.pop('draw_event', None)
+    # a worker may draw more than one band, so show the axes again after
+    hidden = [ax for ax in figure.axes if ax not in axes and ax._visible]
+    for ax in hidden:
+        ax._visible = False
+    # the parent laid out the axes with all of them visible; laying them out
+    # again without the hidden ones would move the others
+    saved = dict((name, vars(figure)[name]) for name in _no_layout if name in vars(figure))
+    for name, value in _no_layout.items():
+        setattr(figure, name, lambda value=value: value)
+    try:
+        figure.draw(renderer)
+    finally:
+        for name in _no_layout:
+            delattr(figure, name)
+        vars(figure).update(saved)
+        for ax in hidden:
+            ax._visible = True
+    buf = numpy.frombuffer(renderer.buffer_rgba(), numpy.uint8).reshape(height, width, 4)
+    return buf[row0:row1].tobytes()
+
+def _cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def _fork_context():
+    'The multiprocessing context (or module) that forks, or None'
+    if not hasattr(multiprocessing, 'get_context'):
+        # before Python 3.4 multiprocessing always forks on POSIX
+        return multiprocessing if hasattr(os, 'fork') else None
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+class FigureCanvasTiledAgg(FigureCanvasAgg):
+    def __init__(self, figure, workers=None):
+        FigureCanvasAgg.__init__(self, figure)
+        if workers is None:
+            workers = _cpu_count()
+        self.workers = workers
+
+    def _painted_bbox(self, ax, renderer):
+        pad = max(rcParams['xtick.major.size'], rcParams['ytick.major.size'],
+                  rcParams['xtick.minor.size'], rcParams['ytick.minor.size'])
+        pad = pad * self.figure.dpi / 72. + 2
+        boxes = [ax.bbox]
+        tight = ax.get_tightbbox(renderer)
+        if tight is not None:
+            boxes.append(tight)
+        return mtransforms.Bbox.union(boxes).padded(pad)
+
+    def _bands(self, renderer, workers):
+        'Split the buffer rows into (row0, row1, axes painting into those rows)'
+        height = int(renderer.height)
+        edges = numpy.linspace(0, height, workers + 1).astype(int)
+        boxes = [(ax, self._painted_bbox(ax, renderer)) for ax in self.figure.axes if ax.get_visible()]
+        bands = []
+        for row0, row1 in zip(edges[:-1], edges[1:]):
+            if row1 <= row0:
+                continue
+            # buffer rows count down from the top, display y up from the bottom
+            y0, y1 = height - row1, height - row0
+            axes = set(ax for ax, box in boxes if box.y0 <= y1 and box.y1 >= y0)
+            bands.append((row0, row1, axes))
+        return bands
+
+    def draw(self):
+        global _figure, _bands
+
+        context = _fork_context()
+        # more processes than cores only add the cost of forking and of what
+        # every worker draws again
+        workers = min(self.workers, _cpu_count())
+        if context is None or workers < 2 or len(self.figure.axes) < 2:
+            return FigureCanvasAgg.draw(self)
+
+        self.renderer = renderer = self.get_renderer()
+        renderer.clear()
+        figure = self.figure
+        # lay out in this process, so that the bands are assigned from the
+        # positions the workers draw at
+        _lay_out(figure, renderer)
+
+        _figure, _bands = figure, self._bands(renderer, workers)
+        try:
+            pool = context.Pool(min(workers, len(_bands)), _forget_fonts)
+            try:
+                pixels = pool.map(_render_band, range(len(_bands)))
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            bands = _bands
+            _figure, _bands = None, None
+
+        # buffer_rgba is read-only on matplotlib 2.0, so write through the
+        # array interface of the C++ renderer
+        width = int(renderer.width)
+        buf = numpy.asarray(renderer._renderer)
+        for (row0, row1, axes), band in zip(bands, pixels):
+            buf[row0:row1] = numpy.frombuffer(band, numpy.uint8).reshape(row1 - row0, width, 4)
+
+        # what Figure.draw would have left behind
+        figure._cachedRenderer = renderer
+        self.callbacks.process('draw_event', DrawEvent('draw_event', self, renderer))